@@ -0,0 +1,43 @@
+"""
+Config lookups.
+
+Run with `python -m benchmarks.bench_config`. Measures the lookups that
+happen per request in middlewares: a top level flag, a nested value read
+section by section, the same value read with a dotted key, and a missing
+key checked with `in`.
+"""
+import time
+
+from waspy import Config
+
+ITERATIONS = 200000
+
+OPTIONS = {
+    'debug': False,
+    'cors': {'handle': True, 'allowed_origins': 'https://example.com'},
+    'limits': {'http': {'max_body_size': 1048576, 'timeout': 30}},
+}
+
+
+def measure(func):
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        func()
+    return (time.perf_counter() - start) / ITERATIONS * 1e9
+
+
+def main():
+    config = Config(_defaults=OPTIONS)
+    scenarios = (
+        ('flag', lambda: config['debug']),
+        ('nested', lambda: config['limits']['http']['timeout']),
+        ('dotted', lambda: config['limits.http.timeout']),
+        ('missing', lambda: 'nope' in config['cors']),
+    )
+    print(f'{"lookup":>10} {"ns":>8}')
+    for name, func in scenarios:
+        print(f'{name:>10} {measure(func):>8.0f}')
+
+
+if __name__ == '__main__':
+    main()
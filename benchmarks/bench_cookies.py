@@ -0,0 +1,58 @@
+"""
+Cookie header parsing.
+
+Run with `python -m benchmarks.bench_cookies`. Compares `RequestCookies`
+with `http.cookies.SimpleCookie` (what `Request.cookies` used before) on a
+realistic browser Cookie header, for an auth middleware looking up a single
+session cookie and for reading every cookie.
+"""
+import time
+from http.cookies import SimpleCookie
+
+from waspy.cookies import RequestCookies
+
+ITERATIONS = 20000
+
+HEADER = (
+    '_ga=GA1.2.1093846541.1541603322; _gid=GA1.2.1582362785.1543425522; '
+    '_fbp=fb.1.1541603322761.1203476340; ajs_anonymous_id=%2200e4b1c0-5b3a-'
+    '4f7e-9d8a-3c1b2a4d5e6f%22; ajs_user_id=%22u_48213%22; '
+    'intercom-id-h=e969a3b2-7c1d-4e5f-8a9b-0c1d2e3f4a5b; '
+    'intercom-session-h=R0Y4eeZ3VkJ4c2RkM2V0Q1lJbz0tLWJ5cHlzN0h4; '
+    'optimizelyEndUserId=oeu1541603323137r0.8171; theme=dark; lang=en-US; '
+    'session=eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9.eyJzdWIiOiI0ODIxMyIsImV4cCI'
+    '6MTU0MzUxMTkyMn0.Zm9vYmFyYmF6cXV4cXV1eGNvcmdlZ3JhdWx0; '
+    'csrftoken="Yw8QX1n0lq3kzPZr7dQzL3nY2mR6p9sT"')
+
+
+def simple_cookie_session():
+    cookies = SimpleCookie(HEADER)
+    return {name: morsel.value for name, morsel in cookies.items()}['session']
+
+
+def simple_cookie_all():
+    cookies = SimpleCookie(HEADER)
+    return {name: morsel.value for name, morsel in cookies.items()}
+
+
+def measure(func):
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        func()
+    return (time.perf_counter() - start) / ITERATIONS * 1e6
+
+
+def main():
+    scenarios = (
+        ('session', simple_cookie_session,
+         lambda: RequestCookies(HEADER)['session']),
+        ('all', simple_cookie_all, lambda: dict(RequestCookies(HEADER))),
+    )
+    print(f'{"scenario":>10} {"SimpleCookie (us)":>18} '
+          f'{"RequestCookies (us)":>20}')
+    for name, old, new in scenarios:
+        print(f'{name:>10} {measure(old):>18.2f} {measure(new):>20.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Import time of waspy.
+
+Run with `python -m benchmarks.bench_importtime`. Every scenario runs in a
+fresh interpreter with `python -X importtime`, and reports the total
+cumulative import time (minus the interpreter's own startup imports) and
+the slowest modules it pulled in. An HTTP only
+service (`from waspy import Application`) should not import aioamqp.
+"""
+import subprocess
+import sys
+
+RUNS = 5
+
+SCENARIOS = (
+    ('import waspy', 'import waspy'),
+    ('http app', 'from waspy import Application, Request'),
+    ('rabbitmq', 'from waspy.transports import RabbitMQTransport'),
+)
+
+
+def import_times(statement):
+    """ Total import time in microseconds and module -> cumulative
+        microseconds, for one fresh interpreter """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    total = 0
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, module = line[len('import time:'):].split('|')
+        times[module.strip()] = int(cumulative)
+        if not module.startswith('  '):
+            # not imported by another module
+            total += int(cumulative)
+    return total, times
+
+
+def main():
+    baseline = min(import_times('pass')[0] for _ in range(RUNS))
+    print(f'{"scenario":>10} {"total (ms)":>11} {"aioamqp":>8}  slowest')
+    for name, statement in SCENARIOS:
+        total, times = min((import_times(statement) for _ in range(RUNS)),
+                           key=lambda result: result[0])
+        slowest = sorted(((t, m) for m, t in times.items()
+                          if not m.startswith('waspy')),
+                         reverse=True)[:3]
+        print(f'{name:>10} {(total - baseline) / 1000:>11.1f} '
+              f'{"yes" if "aioamqp" in times else "no":>8}  '
+              + ', '.join(f'{m} {t / 1000:.1f}' for t, m in slowest))
+
+
+if __name__ == '__main__':
+    main()
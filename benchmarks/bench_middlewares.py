@@ -0,0 +1,71 @@
+"""
+Per request overhead of the middleware chain.
+
+Run with `python -m benchmarks.bench_middlewares`. Every scenario awaits
+the wrapped handler of a route with 0, 5 and 10 pass-through middlewares,
+once for a route that uses all of them and once for a route that opts out
+with `middlewares=()`. The last column is the full
+`Application.handle_request` path for the route with all middlewares.
+"""
+import asyncio
+import time
+
+from waspy import Application, Request
+from waspy.errorlogging import ErrorLoggingBase
+
+REQUESTS = 20000
+
+
+def passthrough_factory():
+    async def factory(app, handler):
+        async def middleware(request):
+            return await handler(request)
+        return middleware
+    return factory
+
+
+async def hello(request):
+    return {'hello': 'world'}
+
+
+def build_app(count):
+    app = Application(
+        middlewares=[passthrough_factory() for _ in range(count)])
+    app.logger = ErrorLoggingBase()
+    app.router.get('/all', hello)
+    app.router.get('/none', hello, middlewares=())
+    return app
+
+
+async def measure_chain(app, path):
+    request = Request(method='GET', path=path)
+    handler = app.router.get_handler_for_request(request)
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        await handler(request)
+    return (time.perf_counter() - start) / REQUESTS * 1e6
+
+
+async def measure_request(app, path):
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        await app.handle_request(Request(method='GET', path=path))
+    return (time.perf_counter() - start) / REQUESTS * 1e6
+
+
+def main():
+    loop = asyncio.get_event_loop()
+    print(f'{"middlewares":>12} {"all (us)":>10} {"none (us)":>10} '
+          f'{"request (us)":>13}')
+    for count in (0, 5, 10):
+        app = build_app(count)
+        loop.run_until_complete(app._wrap_handlers())
+        loop.run_until_complete(measure_chain(app, '/all'))  # warm up
+        all_ = loop.run_until_complete(measure_chain(app, '/all'))
+        none = loop.run_until_complete(measure_chain(app, '/none'))
+        request = loop.run_until_complete(measure_request(app, '/all'))
+        print(f'{count:>12} {all_:>10.2f} {none:>10.2f} {request:>13.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Query string parsing.
+
+Run with `python -m benchmarks.bench_query`. Compares `QueryParams` with
+the previous `parse_qsl` based implementation on a long, filter heavy
+query string, both for parsing everything and for the common case of a
+handler reading only a couple of keys.
+"""
+import time
+from collections import defaultdict
+from urllib import parse
+
+from waspy.webtypes import QueryParams
+
+ITERATIONS = 20000
+
+QUERY = '&'.join(
+    [f'filter[{i}]=field%20{i}%3Avalue+{i}' for i in range(40)] +
+    [f'tag=t{i}' for i in range(20)] +
+    ['page=3', 'per_page=50', 'sort=-created_at'])
+
+
+def parse_qsl_query(string):
+    mappings = defaultdict(list)
+    for k, v in parse.parse_qsl(string):
+        mappings[k].append(v)
+    return mappings
+
+
+def measure(func):
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        func()
+    return (time.perf_counter() - start) / ITERATIONS * 1e6
+
+
+def main():
+    def two_keys_old():
+        query = parse_qsl_query(QUERY)
+        return query['page'][0], query['sort'][0]
+
+    def two_keys_new():
+        query = QueryParams.from_string(QUERY)
+        return query.get('page'), query.get('sort')
+
+    scenarios = (
+        ('two keys', two_keys_old, two_keys_new),
+        ('all keys', lambda: parse_qsl_query(QUERY),
+         lambda: QueryParams.from_string(QUERY).mappings),
+        ('empty', lambda: parse_qsl_query(''),
+         lambda: QueryParams.from_string('').get('page')),
+    )
+    print(f'{"scenario":>10} {"parse_qsl (us)":>15} {"QueryParams (us)":>17}')
+    for name, old, new in scenarios:
+        print(f'{name:>10} {measure(old):>15.2f} {measure(new):>17.2f}')
+
+
+if __name__ == '__main__':
+    main()
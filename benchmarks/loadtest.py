@@ -0,0 +1,336 @@
+"""
+End to end load test.
+
+Run with `python -m benchmarks.loadtest`. Every scenario drives an
+`Application` with a built in asyncio load generator at a fixed
+concurrency, and reports requests per second, p50/p99/p999 latency and the
+RSS of the serving process.
+
+HTTP scenarios run the app with `HTTPTransport` in a child process and
+connect to it over loopback, one connection per request (the transport
+closes connections after every response). The `rabbitmq` scenario replaces
+the broker with an in process stand-in that hands messages between a
+`RabbitMQClientTransport` and a `RabbitMQTransport`, so it measures the
+transports and app without a network; its RSS is the benchmark process.
+
+    python -m benchmarks.loadtest --output before.json
+    python -m benchmarks.loadtest --compare before.json --output after.json
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import signal
+import socket
+import subprocess
+import sys
+import time
+from types import SimpleNamespace
+
+from waspy import Application, Config, Response
+from waspy.errorlogging import ErrorLoggingBase
+from waspy.transports.httptransport import HTTPTransport
+from waspy.transports.rabbitmqtransport import RabbitMQTransport, \
+    RabbitMQClientTransport
+
+FAN_OUT = 5
+
+LARGE_BODY = [{'id': i, 'name': f'item {i}', 'tags': ['a', 'b', 'c'],
+               'price': i * 1.5, 'active': i % 2 == 0} for i in range(1000)]
+
+SCENARIOS = {
+    'hello': '/hello',
+    'path_params': '/users/42/posts/abc',
+    'large_json': '/large',
+    'middlewares': '/middlewares',
+    'fan_out': '/fanout',
+    'rabbitmq': '/hello',
+}
+
+
+def passthrough_factory():
+    async def factory(app, handler):
+        async def middleware(request):
+            return await handler(request)
+        return middleware
+    return factory
+
+
+def build_app(transport, port=None, loop=None):
+    app = Application(transport,
+                      middlewares=[passthrough_factory() for _ in range(10)],
+                      config=Config(_defaults={'debug': False}), loop=loop)
+
+    async def hello(request):
+        return {'hello': 'world'}
+
+    async def post(request):
+        return {'user': request.path_params['user_id'],
+                'post': request.path_params['post_id']}
+
+    async def large(request):
+        return Response(body=LARGE_BODY)
+
+    async def fan_out(request):
+        responses = await asyncio.gather(*(
+            request.app.client.get('localhost', '/hello', port=port)
+            for _ in range(FAN_OUT)))
+        return Response(body={'statuses': [r.status.value
+                                           for r in responses]})
+
+    app.router.get('/hello', hello, middlewares=())
+    app.router.get('/users/{user_id}/posts/{post_id}', post, middlewares=())
+    app.router.get('/large', large, middlewares=())
+    app.router.get('/middlewares', hello)
+    app.router.get('/fanout', fan_out, middlewares=())
+    return app
+
+
+def _serve(port):
+    # the forked child inherits the event loop of the load generator,
+    # which it must not share
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    transport = HTTPTransport(port=port, shutdown_grace_period=0,
+                              shutdown_wait_period=0)
+    sys.stdout = open(os.devnull, 'w')
+    build_app(transport, port, loop).run()
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _rss_mb(pid):
+    """ (current, peak) resident memory of a process, linux only """
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            status = dict(line.split(':', 1) for line in f)
+    except OSError:
+        return None, None
+    return (int(status['VmRSS'].split()[0]) / 1024,
+            int(status['VmHWM'].split()[0]) / 1024)
+
+
+async def _wait_for_port(port, timeout=10):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection('127.0.0.1', port)
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.05)
+        else:
+            writer.close()
+            return
+
+
+def http_sender(port, path):
+    request = (f'GET {path} HTTP/1.1\r\nHost: localhost\r\n'
+               f'Connection: close\r\n\r\n').encode('latin-1')
+
+    async def send():
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        try:
+            writer.write(request)
+            data = await reader.read()
+        finally:
+            writer.close()
+        return data[9:12] == b'200'
+    return send
+
+
+class _LocalBroker:
+    """ Stands in for the amqp channel of both transports. Requests are
+        delivered to the server, replies straight back to the client. """
+    def __init__(self, client, server):
+        self.client = client
+        self.server = server
+        self.delivery_tag = 0
+
+    async def basic_publish(self, *, exchange_name, routing_key, properties,
+                            payload, mandatory=False):
+        message = SimpleNamespace(headers=None, correlation_id=None,
+                                  message_id=None, reply_to=None,
+                                  content_type=None, content_encoding=None)
+        message.__dict__.update(properties)
+        if routing_key == self.client.response_queue_name:
+            await self.client.handle_responses(self, payload, None, message)
+            return
+        self.delivery_tag += 1
+        envelope = SimpleNamespace(routing_key=routing_key,
+                                   delivery_tag=self.delivery_tag)
+        await self.server.handle_request(self, payload, envelope, message)
+
+
+async def rabbitmq_sender(path):
+    server = RabbitMQTransport(url='localhost')
+    client = RabbitMQClientTransport(url='localhost')
+    app = build_app(server)
+    app.logger = ErrorLoggingBase()
+    await app._wrap_handlers()
+    server._handler = app.handle_request
+    broker = _LocalBroker(client, server)
+    for transport in (server, client):
+        transport.channel = broker
+        transport._channel_ready.set()
+    client._connected = True
+
+    async def send():
+        response = await client.make_request('service', 'GET', path,
+                                             timeout=10)
+        return response.status.value == 200
+    return send
+
+
+async def generate_load(send, *, concurrency, duration, warmup):
+    """ Calls `send` from `concurrency` loops for `duration` seconds, after
+        `warmup` seconds that are not recorded """
+    latencies = []
+    errors = 0
+    recording = False
+
+    async def worker(deadline):
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                ok = await send()
+            except Exception:
+                ok = False
+            if not recording:
+                continue
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    if warmup:
+        await asyncio.gather(*(worker(time.perf_counter() + warmup)
+                               for _ in range(concurrency)))
+    recording = True
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(start + duration)
+                           for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return latencies, errors, elapsed
+
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+
+    def percentile(q):
+        if not latencies:
+            return None
+        index = min(len(latencies) - 1, int(q * len(latencies)))
+        return round(latencies[index] * 1000, 3)
+
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': percentile(0.50),
+        'p99_ms': percentile(0.99),
+        'p999_ms': percentile(0.999),
+    }
+
+
+def run_scenario(name, *, concurrency, duration, warmup):
+    loop = asyncio.get_event_loop()
+    path = SCENARIOS[name]
+    if name == 'rabbitmq':
+        send = loop.run_until_complete(rabbitmq_sender(path))
+        latencies, errors, elapsed = loop.run_until_complete(generate_load(
+            send, concurrency=concurrency, duration=duration, warmup=warmup))
+        result = summarize(latencies, errors, elapsed)
+        result['rss_mb'], result['peak_rss_mb'] = _rss_mb(os.getpid())
+        return result
+
+    port = _free_port()
+    server = multiprocessing.Process(target=_serve, args=(port,), daemon=True)
+    server.start()
+    try:
+        loop.run_until_complete(_wait_for_port(port))
+        latencies, errors, elapsed = loop.run_until_complete(generate_load(
+            http_sender(port, path), concurrency=concurrency,
+            duration=duration, warmup=warmup))
+        result = summarize(latencies, errors, elapsed)
+        result['rss_mb'], result['peak_rss_mb'] = _rss_mb(server.pid)
+    finally:
+        os.kill(server.pid, signal.SIGTERM)
+        server.join(5)
+        if server.is_alive():
+            server.kill()
+    return result
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL, universal_newlines=True,
+            check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _format(value, previous=None):
+    if value is None:
+        return '-'
+    if previous:
+        return f'{value:.1f} ({(value - previous) / previous:+.0%})'
+    return f'{value:.1f}'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('scenarios', nargs='*',
+                        help=f'scenarios to run, all by default: '
+                             f'{", ".join(SCENARIOS)}')
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--warmup', type=float, default=2.0)
+    parser.add_argument('--output', help='write the results as json')
+    parser.add_argument('--compare', help='json results to compare with')
+    args = parser.parse_args(argv)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f'unknown scenarios: {", ".join(sorted(unknown))}')
+
+    previous = {}
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)['scenarios']
+
+    results = {
+        'commit': _commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'concurrency': args.concurrency,
+        'duration': args.duration,
+        'scenarios': {},
+    }
+    print(f'{"scenario":>12} {"rps":>16} {"p50 ms":>8} {"p99 ms":>8} '
+          f'{"p999 ms":>8} {"errors":>7} {"rss mb":>7}')
+    for name in args.scenarios or SCENARIOS:
+        result = run_scenario(name, concurrency=args.concurrency,
+                              duration=args.duration, warmup=args.warmup)
+        results['scenarios'][name] = result
+        before = previous.get(name, {})
+        print(f'{name:>12} {_format(result["rps"], before.get("rps")):>16} '
+              f'{_format(result["p50_ms"]):>8} {_format(result["p99_ms"]):>8} '
+              f'{_format(result["p999_ms"]):>8} {result["errors"]:>7} '
+              f'{_format(result["rss_mb"]):>7}')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
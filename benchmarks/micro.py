@@ -0,0 +1,241 @@
+"""
+Micro-benchmarks of the request hot path.
+
+Run with `python -m benchmarks.micro`. Each benchmark times one operation
+with `timeit` (best of several repeats) and reports nanoseconds per call.
+
+Save a baseline on a release, and check later changes against it on the
+same machine. The check exits with status 1 when a benchmark got slower
+than the baseline by more than the threshold:
+
+    python -m benchmarks.micro --save baseline.json
+    python -m benchmarks.micro --check baseline.json --threshold 1.25
+"""
+import argparse
+import fnmatch
+import json
+import sys
+import timeit
+
+from waspy import Request
+from waspy.router import Router, Methods
+from waspy.webtypes import Parseable, QueryParams
+from waspy.parser import JSONParser, parsers
+from waspy.transports.httptransport import _HTTPServerProtocol
+from waspy.transports.rabbitmqtransport import parse_url_to_topic
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """ Registers `setup`, which returns the function to time """
+    def decorator(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return decorator
+
+
+def _router(size):
+    """ A router with `size` routes, half static and half with params """
+    router = Router()
+
+    async def handler(request):
+        return None
+
+    for i in range(size // 2):
+        router.get(f'/static/{i}/items', handler)
+        router.get(f'/resource{i}/{{id}}/sub/{{sub_id}}', handler)
+    wrapper = router._get_and_wrap_routes()
+    try:
+        wrapped, _ = next(wrapper)
+        while True:
+            wrapped, _ = wrapper.send(wrapped)
+    except StopIteration:
+        pass
+    return router
+
+
+for _size in (10, 100, 1000):
+    @benchmark(f'router.static.{_size}')
+    def _static(size=_size):
+        router = _router(size)
+        request = Request(path=f'/static/{size // 2 - 1}/items')
+        return lambda: router.get_handler_for_request(request)
+
+    @benchmark(f'router.params.{_size}')
+    def _params(size=_size):
+        router = _router(size)
+        request = Request(path=f'/resource{size // 2 - 1}/42/sub/abc')
+        return lambda: router.get_handler_for_request(request)
+
+
+PAYLOADS = {
+    'small': {'id': 1, 'name': 'waspy'},
+    'list': [{'id': i, 'name': f'item {i}'} for i in range(100)],
+    'nested': {'a': {'b': {'c': {'d': [1, 2, {'e': 'f'}] * 10}}}},
+}
+
+parsers.setdefault('application/json', JSONParser())
+
+for _shape, _payload in PAYLOADS.items():
+    @benchmark(f'parseable.body.{_shape}')
+    def _decode(payload=_payload):
+        raw = json.dumps(payload).encode()
+
+        def decode():
+            parseable = Parseable(content_type='application/json')
+            parseable.body = raw
+            return parseable.body
+        return decode
+
+    @benchmark(f'parseable.raw_body.{_shape}')
+    def _encode(payload=_payload):
+        def encode():
+            parseable = Parseable(content_type='application/json')
+            parseable.body = payload
+            return parseable.raw_body
+        return encode
+
+
+QUERIES = {
+    'short': 'page=2&sort=name',
+    'filters': '&'.join(f'filter[{i}]=field%20{i}%3Avalue+{i}'
+                        for i in range(40)) + '&page=3',
+}
+
+for _name, _query in QUERIES.items():
+    @benchmark(f'query.get.{_name}')
+    def _query_get(query=_query):
+        return lambda: QueryParams.from_string(query).get('page')
+
+    @benchmark(f'query.all.{_name}')
+    def _query_all(query=_query):
+        return lambda: QueryParams.from_string(query).mappings
+
+
+class _Parent:
+    prefix = ''
+    max_header_size = 65536
+    max_body_size = 1024 * 1024
+    header_timeout = 10
+    body_timeout = 60
+
+    def __init__(self):
+        self._connections = set()
+
+    async def handle_incoming_request(self, request):
+        pass
+
+
+class _Task:
+    def add_done_callback(self, callback):
+        pass
+
+    def cancel(self):
+        pass
+
+
+class _Loop:
+    """ Stops at the point where the request would be handled """
+    def create_task(self, coroutine):
+        coroutine.close()
+        return _Task()
+
+    def call_later(self, delay, callback):
+        return _Task()
+
+
+STREAMS = {
+    'get': b'GET /hello HTTP/1.1\r\nHost: localhost\r\n\r\n',
+    'browser': (
+        b'GET /users/42?fields=name,email HTTP/1.1\r\nHost: api.example\r\n'
+        + b''.join(b'X-Header-%d: value %d\r\n' % (i, i) for i in range(15))
+        + b'Cookie: session=abc; theme=dark\r\n\r\n'),
+    'post_json': (
+        b'POST /items HTTP/1.1\r\nHost: localhost\r\n'
+        b'Content-Type: application/json\r\nContent-Length: 1024\r\n\r\n'
+        + b'x' * 1024),
+}
+
+for _name, _stream in STREAMS.items():
+    @benchmark(f'http.parse.{_name}')
+    def _parse(stream=_stream):
+        parent, loop = _Parent(), _Loop()
+
+        def parse():
+            protocol = _HTTPServerProtocol(parent=parent, loop=loop)
+            protocol.data_received(stream)
+            return protocol.request
+        return parse
+
+
+@benchmark('topic.cached')
+def _topic_cached():
+    return lambda: parse_url_to_topic(Methods.GET, '/foo/{fooid}/bar/{barid}')
+
+
+@benchmark('topic.uncached')
+def _topic_uncached():
+    parse = parse_url_to_topic.__wrapped__
+    return lambda: parse(Methods.GET, '/foo/{fooid}/bar/{barid}')
+
+
+def run(names, repeat=5, min_time=0.1):
+    """ name -> best nanoseconds per call """
+    results = {}
+    for name in names:
+        func = BENCHMARKS[name]()
+        timer = timeit.Timer(func)
+        number = 1
+        while timer.timeit(number) < min_time / repeat:
+            number *= 2
+        results[name] = min(timer.repeat(repeat, number)) / number * 1e9
+    return results
+
+
+def regressions(results, baseline, threshold):
+    """ [(name, ratio)] of benchmarks slower than baseline * threshold """
+    slower = []
+    for name, ns in results.items():
+        before = baseline.get(name)
+        if before and ns / before > threshold:
+            slower.append((name, ns / before))
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('patterns', nargs='*', default=['*'],
+                        help='glob patterns of benchmarks to run')
+    parser.add_argument('--save', help='write the results as json')
+    parser.add_argument('--check', help='json baseline to compare with')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='allowed slowdown compared to the baseline')
+    args = parser.parse_args(argv)
+
+    names = [name for name in BENCHMARKS
+             if any(fnmatch.fnmatch(name, p) for p in args.patterns)]
+    baseline = {}
+    if args.check:
+        with open(args.check) as f:
+            baseline = json.load(f)
+
+    results = run(names)
+    for name, ns in results.items():
+        line = f'{name:<28} {ns:>12.0f} ns'
+        if name in baseline:
+            line += f'  {ns / baseline[name]:>6.2f}x'
+        print(line)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    slower = regressions(results, baseline, args.threshold)
+    for name, ratio in slower:
+        print(f'REGRESSION {name}: {ratio:.2f}x the baseline', file=sys.stderr)
+    return 1 if slower else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,30 @@
+from waspy import Worker
+from waspy.exceptions import RetryTask
+from waspy.transports import RabbitMQWorkerTransport
+
+rabbit = RabbitMQWorkerTransport(
+    url='127.0.0.1',  # requires rabbitmq running locally (docker?)
+    port=5672,
+    queue='reports',
+    virtualhost='/',
+    username='guest',
+    password='guest',
+    ssl=False,
+    concurrency=10,
+    max_retries=5,
+)
+
+worker = Worker(rabbit)
+
+
+@worker.task
+async def handle_report(task):
+    report = task.body
+    if report.get('not_ready'):
+        # put it back on the queue, and try again in 30 seconds
+        raise RetryTask(delay=30)
+    print(f'building report {report} (attempt {task.attempt})')
+
+
+if __name__ == '__main__':
+    worker.run()
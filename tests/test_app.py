@@ -0,0 +1,99 @@
+import asyncio
+import json
+
+from waspy import Application, Config, Request, Response
+from waspy._cors import CORSHandler
+from waspy.errorlogging import ErrorLoggingBase
+
+
+def _app_wrapped(app):
+    app.logger = ErrorLoggingBase()
+    asyncio.get_event_loop().run_until_complete(app._wrap_handlers())
+    return app
+
+
+def _send(app, request):
+    return asyncio.get_event_loop().run_until_complete(
+        app.handle_request(request))
+
+
+def test_large_bodies_are_encoded_off_loop():
+    size = {'rows': 10}
+
+    async def export(request):
+        return Response(body=[{'row': i} for i in range(size['rows'])])
+
+    app = Application(offload_encoding_threshold=1000)
+    app.router.get('/export', export)
+    app = _app_wrapped(app)
+
+    response = _send(app, Request(path='/export'))
+    assert json.loads(response.raw_body) == [{'row': i} for i in range(10)]
+    assert app._large_body_handlers == set()
+
+    size['rows'] = 1000
+    _send(app, Request(path='/export'))
+    assert export in app._large_body_handlers
+    assert app._executors == {}
+
+    response = _send(app, Request(path='/export'))
+    assert 'thread' in app._executors
+    assert len(json.loads(response.raw_body)) == 1000
+
+    # handlers that shrink go back to encoding on the loop
+    size['rows'] = 1
+    _send(app, Request(path='/export'))
+    assert app._large_body_handlers == set()
+    app._shutdown_executors(app)
+
+
+def test_static_routes_learn_their_own_handler():
+    async def large(request):
+        return Response(body=[{'row': i} for i in range(1000)])
+
+    app = Application(offload_encoding_threshold=1000)
+    app.router.add_static_route('GET', '/large', large)
+    app = _app_wrapped(app)
+
+    _send(app, Request(path='/large'))
+    assert app._large_body_handlers == {large}
+    app._shutdown_executors(app)
+
+
+def test_serialization_errors_are_500():
+    async def broken(request):
+        return {'not json': object()}
+
+    app = Application()
+    app.router.get('/broken', broken)
+    app = _app_wrapped(app)
+    response = _send(app, Request(path='/broken'))
+    assert response.status.value == 500
+
+
+def test_config_reload_rebuilds_cors(tmp_path):
+    path = tmp_path / 'config.yaml'
+    path.write_text('cors:\n  handle: true\n'
+                    '  allowed_origins: https://a.example\n')
+    app = Application(config=Config().from_file(str(path)))
+    app._set_cors_handler(CORSHandler.from_config(app.config))
+    app.config.subscribe(app._config_reloaded)
+    seen = []
+    app.on_config_reload.append(seen.append)
+    assert app._cors_handler.allowed_origins == 'https://a.example'
+
+    path.write_text('cors:\n  handle: true\n'
+                    '  allowed_origins: https://b.example\n')
+    app.reload_config()
+    assert app._cors_handler.allowed_origins == 'https://b.example'
+    assert seen == [app]
+
+    # a broken config keeps the running one
+    path.write_text('cors:\n  handle: true\n  allowed_origins: ""\n')
+    app.reload_config()
+    assert app._cors_handler.allowed_origins == 'https://b.example'
+
+    path.write_text('debug: false\n')
+    app.reload_config()
+    assert app._cors_handler is None
+    assert app.router.options_handler is None
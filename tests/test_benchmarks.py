@@ -0,0 +1,15 @@
+import pytest
+
+from benchmarks import micro
+
+
+@pytest.mark.parametrize('name', sorted(micro.BENCHMARKS))
+def test_micro_benchmarks_run(name):
+    # keeps the benchmarks working as the code they measure changes
+    assert micro.BENCHMARKS[name]()() is not None
+
+
+def test_regressions():
+    baseline = {'a': 100, 'b': 100, 'new': None}
+    results = {'a': 130, 'b': 110, 'new': 50, 'unknown': 1}
+    assert micro.regressions(results, baseline, 1.25) == [('a', 1.3)]
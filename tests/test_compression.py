@@ -0,0 +1,105 @@
+import asyncio
+import gzip
+from types import SimpleNamespace
+
+import pytest
+
+from waspy import Request, Response
+from waspy.compression import compressors, negotiate_encoding, compress, \
+    decompress
+from waspy.transports import HTTPTransport, RabbitMQTransport
+
+
+@pytest.mark.parametrize('accept,expected', [
+    ('gzip', 'gzip'),
+    ('deflate, gzip', 'gzip'),
+    ('gzip;q=0.5, deflate', 'deflate'),
+    ('identity', None),
+    ('gzip;q=0', None),
+    ('', None),
+    ('*', 'zstd' if 'zstd' in compressors else 'gzip'),
+    ('br, gzip', 'br' if 'br' in compressors else 'gzip'),
+])
+def test_negotiate_encoding(accept, expected):
+    assert negotiate_encoding(accept) == expected
+
+
+@pytest.mark.parametrize('encoding', sorted(compressors))
+def test_round_trip(encoding):
+    data = b'{"hello": "world"}' * 100
+    compressed = compress(encoding, data)
+    assert len(compressed) < len(data)
+    assert decompress(encoding, compressed) == data
+
+
+def test_unknown_encoding():
+    with pytest.raises(ValueError):
+        decompress('lzma', b'')
+
+
+def _http_response(accept, body, **kwargs):
+    transport = HTTPTransport(**kwargs)
+    request = Request(headers={'accept-encoding': accept} if accept else {})
+    response = Response(body=body)
+
+    async def handler(request):
+        return response
+    transport._handler = handler
+    return asyncio.get_event_loop().run_until_complete(
+        transport.handle_incoming_request(request))
+
+
+def test_http_compresses_large_responses():
+    body = 'x' * 2000
+    response = _http_response('gzip', body)
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert gzip.decompress(response.raw_body) == body.encode()
+
+
+@pytest.mark.parametrize('accept,body,kwargs', [
+    (None, 'x' * 2000, {}),
+    ('gzip', 'x' * 100, {}),
+    ('identity', 'x' * 2000, {}),
+    ('gzip', 'x' * 2000, {'compression_threshold': None}),
+])
+def test_http_leaves_response_alone(accept, body, kwargs):
+    response = _http_response(accept, body, **kwargs)
+    assert 'Content-Encoding' not in response.headers
+    assert response.raw_body == body.encode()
+
+
+class _ReplyChannel:
+    def __init__(self):
+        self.published = []
+
+    async def basic_publish(self, *, exchange_name, payload, routing_key,
+                            properties):
+        self.published.append((payload, properties))
+
+
+def test_rabbitmq_request_and_reply_compression():
+    loop = asyncio.get_event_loop()
+    transport = RabbitMQTransport(url='localhost')
+    transport._channel_ready.set()
+    seen = []
+
+    async def handler(request):
+        seen.append(request.raw_body)
+        return Response(body='y' * 5000, content_type='text/plain')
+    transport._handler = handler
+
+    channel = _ReplyChannel()
+    properties = SimpleNamespace(
+        headers={'accept-encoding': 'gzip'}, correlation_id='abc',
+        message_id='1', reply_to='replies', content_type='text/plain',
+        content_encoding='gzip')
+    envelope = SimpleNamespace(routing_key='post.foo', delivery_tag=1)
+    loop.run_until_complete(transport.handle_request(
+        channel, gzip.compress(b'request'), envelope, properties,
+        futurize=False))
+
+    assert seen == [b'request']
+    payload, reply_properties = channel.published[0]
+    assert reply_properties['content_encoding'] == 'gzip'
+    assert gzip.decompress(payload) == b'y' * 5000
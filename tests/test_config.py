@@ -1,3 +1,5 @@
+import asyncio
+import os
 import pytest
 import io
 import yaml
@@ -57,21 +59,25 @@ def test_get_not_existing_sub_section(config):
 
 def test_get_env_var_with_no_default(config, monkeypatch):
     monkeypatch.setenv('DATABASE_MIGRATION_PASSWORD', '1234pass')
+    config.reload()
     assert config['database']['migration']['password'] == '1234pass'
 
 
 def test_get_env_var_override(config, monkeypatch):
     monkeypatch.setenv('DATABASE_USERNAME', 'other_user')
+    config.reload()
     assert config['database']['username'] == 'other_user'
 
 
 def test_get_int_from_env_var(config, monkeypatch):
     monkeypatch.setenv('WASP_SETTING1', '1')
+    config.reload()
     assert config['wasp']['setting1'] == 1
 
 
 def test_get_bool_from_env_var(config, monkeypatch):
     monkeypatch.setenv('flat', 'true')
+    config.reload()
     assert config['flat'] == True
 
 
@@ -81,8 +87,82 @@ def test_get_flat_with_underscores(config):
 
 def test_get_flat_with_underscores_envvar(config, monkeypatch):
     monkeypatch.setenv('FLAT_WITH_UNDERSCORES', 'blarg')
+    config.reload()
     assert config['flat_with_underscores'] == 'blarg'
 
 def test_using_in_syntax(config):
     assert 'flat' in config
     assert 'nope' not in config
+
+
+def test_dotted_keys(config):
+    assert config['database.migration.username'] == 'migration_user'
+    assert config['database']['migration.username'] == 'migration_user'
+    assert config.get('database.nope', 'default') == 'default'
+
+
+def test_sections_are_cached(config):
+    assert config['database'] is config['database']
+
+
+def test_environment_is_read_at_load(config, monkeypatch):
+    database = config['database']
+    monkeypatch.setenv('DATABASE_USERNAME', 'other_user')
+    assert database['username'] == 'normal_user'
+    assert 'password' not in database
+    monkeypatch.setenv('DATABASE_PASSWORD', 'secret')
+    config.reload()
+    # sections handed out before the reload see the new snapshot
+    assert database['username'] == 'other_user'
+    assert database['password'] == 'secret'
+
+
+def test_not_loaded():
+    with pytest.raises(ValueError):
+        Config()['debug']
+
+
+def test_from_file_and_reload(tmp_path):
+    path = tmp_path / 'config.yaml'
+    path.write_text('http:\n  timeout: 1\n')
+    config = Config().from_file(str(path))
+    assert config['http']['timeout'] == 1
+    path.write_text('http:\n  timeout: 2\n')
+    assert config['http']['timeout'] == 1
+    config['http'].reload()
+    assert config['http']['timeout'] == 2
+
+
+def test_subscribers_are_called_after_reload(config, monkeypatch):
+    seen = []
+    config.subscribe(lambda c: seen.append(c['database']['username']))
+    monkeypatch.setenv('DATABASE_USERNAME', 'other_user')
+    config['database'].reload()
+    assert seen == ['other_user']
+
+
+def test_failed_reload_keeps_snapshot(tmp_path):
+    path = tmp_path / 'config.yaml'
+    path.write_text('timeout: 1\n')
+    config = Config().from_file(str(path))
+    seen = []
+    config.subscribe(seen.append)
+    path.write_text('timeout: [1\n')
+    with pytest.raises(yaml.YAMLError):
+        config.reload()
+    assert config['timeout'] == 1
+    assert seen == []
+
+
+def test_watch_reloads_changed_file(tmp_path):
+    path = tmp_path / 'config.yaml'
+    path.write_text('timeout: 1\n')
+    config = Config().from_file(str(path))
+    loop = asyncio.get_event_loop()
+    watcher = loop.create_task(config.watch(interval=0.01))
+    loop.run_until_complete(asyncio.sleep(0.03))
+    path.write_text('timeout: 2\n')
+    os.utime(str(path), (1, 1))
+    loop.run_until_complete(asyncio.sleep(0.05))
+    watcher.cancel()
+    assert config['timeout'] == 2
@@ -1,11 +1,14 @@
+import asyncio
 import json
 from unittest.mock import MagicMock
 
 import pytest
 
-from waspy import Response
-from waspy.exceptions import UnsupportedMediaType
-from waspy.parser import JSONParser
+from waspy import Application, Request, Response
+from waspy.errorlogging import ErrorLoggingBase
+from waspy.exceptions import UnsupportedMediaType, ParseError
+from waspy.parser import JSONParser, MsgpackParser, CBORParser, \
+    negotiate_content_type
 
 
 @pytest.mark.parametrize("parsers,content_type,fail", [
@@ -48,3 +51,137 @@ def test_body_raw_body(monkeypatch):
     r.body = new_body
     assert r.body == new_body
     assert r.raw_body == json.dumps(new_body).encode()
+
+
+class CountingParser(JSONParser):
+    def __init__(self):
+        self.encodes = 0
+        self.decodes = 0
+
+    def encode(self, data):
+        self.encodes += 1
+        return super().encode(data)
+
+    def decode(self, data):
+        self.decodes += 1
+        return super().decode(data)
+
+
+def test_bytes_body_is_reused_as_raw_body(monkeypatch):
+    parser = CountingParser()
+    monkeypatch.setattr('waspy.webtypes.parsers',
+                        {'application/json': parser})
+    raw = b'{"test": "bytes"}'
+    r = Response(content_type='application/json')
+    r.body = raw
+    assert r.raw_body is raw
+    assert r.body == {'test': 'bytes'}
+    assert r.raw_body is raw
+    assert parser.encodes == 0
+    assert parser.decodes == 1
+
+
+def test_response_is_serialized_once(monkeypatch):
+    parser = CountingParser()
+    monkeypatch.setattr('waspy.webtypes.parsers',
+                        {'application/json': parser})
+
+    async def handle(request):
+        return {'test': 'data'}
+
+    app = Application()
+    app.logger = ErrorLoggingBase()
+    app.router.get('/', handle)
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(app._wrap_handlers())
+    response = loop.run_until_complete(app.handle_request(Request(path='/')))
+    assert response.raw_body == b'{"test": "data"}'
+    assert response.raw_body == b'{"test": "data"}'
+    assert parser.encodes == 1
+
+
+def test_unparsed_content_types_pass_through():
+    async def handle(request):
+        return Response(body=b'\x89PNG', content_type='image/png')
+
+    app = Application()
+    app.logger = ErrorLoggingBase()
+    app.router.get('/', handle)
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(app._wrap_handlers())
+    response = loop.run_until_complete(app.handle_request(Request(path='/')))
+    assert response.status.value == 200
+    assert response.raw_body == b'\x89PNG'
+
+
+@pytest.mark.parametrize("accept,expected", [
+    ('application/msgpack', 'application/msgpack'),
+    ('application/cbor;q=0.5, application/msgpack', 'application/msgpack'),
+    ('application/cbor;q=0.9, application/msgpack;q=0.1', 'application/cbor'),
+    ('*/*', 'application/json'),
+    ('text/html, */*;q=0.1', 'application/json'),
+    ('application/*', 'application/json'),
+    ('application/msgpack;q=0, */*', 'application/json'),
+    ('text/html', 'application/json'),
+    ('APPLICATION/CBOR', 'application/cbor'),
+])
+def test_negotiate_content_type(accept, expected):
+    available = ('application/json', 'application/msgpack', 'application/cbor')
+    assert negotiate_content_type(
+        accept, available, 'application/json') == expected
+
+
+@pytest.mark.parametrize("parser_class,module", [
+    (MsgpackParser, 'msgpack'),
+    (CBORParser, 'cbor2'),
+])
+def test_binary_parsers(parser_class, module):
+    pytest.importorskip(module)
+    parser = parser_class()
+    data = {'list': [1, 2.5, 'three', None, True], 'nested': {'a': 'b'}}
+    assert parser.decode(parser.encode(data)) == data
+    with pytest.raises(ParseError):
+        parser.decode(b'\xc1\xff\xff')
+
+
+def test_response_follows_accept_header():
+    pytest.importorskip('msgpack')
+
+    async def handle(request):
+        return {'hello': 'world'}
+
+    app = Application(parsers=[JSONParser(), MsgpackParser()])
+    app.logger = ErrorLoggingBase()
+    app.router.get('/', handle)
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(app._wrap_handlers())
+
+    request = Request(path='/', headers={'accept': 'application/msgpack'})
+    response = loop.run_until_complete(app.handle_request(request))
+    assert response.content_type == 'application/msgpack'
+    assert MsgpackParser().decode(response.raw_body) == {'hello': 'world'}
+
+    response = loop.run_until_complete(app.handle_request(Request(path='/')))
+    assert response.content_type == 'application/json'
+
+
+@pytest.mark.parametrize("body,raw_body", [
+    (b'{"a":1}', b'{"a":1}'),
+    ('hello', b'hello'),
+])
+def test_encoded_bodies_ignore_accept_header(body, raw_body):
+    pytest.importorskip('msgpack')
+
+    async def handle(request):
+        return Response(body=body)
+
+    app = Application(parsers=[JSONParser(), MsgpackParser()])
+    app.logger = ErrorLoggingBase()
+    app.router.get('/', handle)
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(app._wrap_handlers())
+
+    request = Request(path='/', headers={'accept': 'application/msgpack'})
+    response = loop.run_until_complete(app.handle_request(request))
+    assert response.content_type == 'application/json'
+    assert response.raw_body == raw_body
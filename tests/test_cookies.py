@@ -0,0 +1,70 @@
+from datetime import datetime
+from http.cookies import SimpleCookie
+from unittest import mock
+
+import pytest
+
+from waspy import Request, Response
+from waspy.cookies import RequestCookies, build_set_cookie, parse_cookies
+from waspy.transports import httptransport
+
+BROWSER_HEADER = (
+    '_ga=GA1.2.1093846541.1541603322; _gid=GA1.2.1582362785.1543425522; '
+    'session="abc\\"def"; theme=dark; empty=; lang=en-US')
+
+
+def test_lookups_match_simple_cookie():
+    expected = {k: v.value for k, v in SimpleCookie(BROWSER_HEADER).items()}
+    cookies = RequestCookies(BROWSER_HEADER)
+    for name, value in expected.items():
+        assert cookies[name] == value
+    assert dict(cookies) == expected == parse_cookies(BROWSER_HEADER)
+
+
+def test_names_only_match_whole_cookies():
+    cookies = RequestCookies('xtheme=light; theme=dark')
+    assert cookies['theme'] == 'dark'
+    assert 'heme' not in cookies
+    assert cookies.get('missing') is None
+    with pytest.raises(KeyError):
+        cookies['missing']
+
+
+def test_first_duplicate_wins():
+    header = 'id=specific; id=general'
+    assert RequestCookies(header)['id'] == 'specific'
+    assert parse_cookies(header) == {'id': 'specific'}
+
+
+def test_request_without_cookies():
+    assert len(Request().cookies) == 0
+
+
+def test_build_set_cookie():
+    assert build_set_cookie('id', 'abc') == 'id=abc; Path=/'
+    assert build_set_cookie(
+        'id', 'a b', max_age=60, expires=datetime(2020, 1, 2, 3, 4, 5),
+        domain='example.com', secure=True, httponly=True, samesite='Lax'
+    ) == ('id="a b"; Expires=Thu, 02 Jan 2020 03:04:05 GMT; Max-Age=60; '
+          'Domain=example.com; Path=/; Secure; HttpOnly; SameSite=Lax')
+    with pytest.raises(ValueError):
+        build_set_cookie('bad name', 'value')
+    with pytest.raises(ValueError):
+        build_set_cookie('id', 'value', samesite='sometimes')
+
+
+def test_http_response_has_a_header_per_cookie():
+    response = Response(body=None)
+    response.set_cookie('id', 'abc', httponly=True)
+    response.set_cookie('theme', 'dark')
+    response.delete_cookie('old')
+
+    protocol = httptransport._HTTPServerProtocol(parent=mock.Mock(),
+                                                 loop=None)
+    protocol._transport = mock.Mock()
+    protocol.send_response(response)
+    written = protocol._transport.write.call_args[0][0].decode()
+    assert 'Set-Cookie: id=abc; Path=/; HttpOnly\r\n' in written
+    assert 'Set-Cookie: theme=dark; Path=/\r\n' in written
+    assert ('Set-Cookie: old=; Expires=Thu, 01 Jan 1970 00:00:00 GMT; '
+            'Max-Age=0; Path=/\r\n') in written
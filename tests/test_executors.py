@@ -0,0 +1,62 @@
+import asyncio
+import os
+
+import pytest
+
+from waspy import Application, Request
+from waspy.ctx import request_context
+
+
+def report(request):
+    return {'pid': os.getpid(),
+            'correlation_id': request_context.get()['correlation_id'],
+            'id': request.path_params['id'],
+            'body': request.body}
+
+
+def _send(app, request):
+    loop = asyncio.get_event_loop()
+    app._set_ctx(request)
+    handler = app.router.get_handler_for_request(request)
+    return loop.run_until_complete(handler(request))
+
+
+@pytest.mark.parametrize('executor', ['thread', 'process'])
+def test_handler_runs_in_executor(executor):
+    app = Application()
+    app.router.post('/reports/{id}', report, executor=executor)
+    asyncio.get_event_loop().run_until_complete(app._wrap_handlers())
+
+    request = Request(method='POST', path='/reports/12', correlation_id='abc',
+                      body=b'{"rows": 3}', content_type='application/json')
+    response = _send(app, request)
+    app._shutdown_executors(app)
+
+    assert response.body['correlation_id'] == 'abc'
+    assert response.body['id'] == '12'
+    assert response.body['body'] == {'rows': 3}
+    if executor == 'process':
+        assert response.body['pid'] != os.getpid()
+    else:
+        assert response.body['pid'] == os.getpid()
+
+
+def test_executor_pools_are_shared_and_stopped():
+    app = Application()
+    app.router.get('/a', report, executor='thread')
+    app.router.get('/b', report, executor='thread')
+    asyncio.get_event_loop().run_until_complete(app._wrap_handlers())
+    assert len(app._executors) == 1
+    asyncio.get_event_loop().run_until_complete(app.run_on_stop_hooks())
+    assert app._executors == {}
+
+
+def test_coroutine_handlers_cant_use_executor():
+    async def handler(request):
+        pass
+
+    app = Application()
+    with pytest.raises(ValueError):
+        app.router.get('/', handler, executor='thread')
+    with pytest.raises(ValueError):
+        app.router.get('/', report, executor='gpu')
@@ -1,6 +1,12 @@
+import asyncio
+import os
+import socket
+
+import pytest
 from unittest import mock
 from waspy.transports import httptransport
-from waspy.webtypes import Request
+from waspy.transports.testtransport import _MemoryTransport
+from waspy.webtypes import Request, Response
 
 
 def test_url_parsing_urldecode():
@@ -8,9 +14,9 @@ def test_url_parsing_urldecode():
     transport.request = Request()
     transport._parent.prefix = ''
 
-    transport.on_url = httptransport._HTTPServerProtocol.on_url
+    transport._parse_url = httptransport._HTTPServerProtocol._parse_url
 
-    transport.on_url(transport, b'/hello%2Bthere?title=%D0%BF%D1%80%D0%B0%D0%B2%D0%BE%D0%B2%D0%B0%D1%8F+%D0%B7%D0%B0%D1%89%D0%B8%D1%82%D0%B0')
+    transport._parse_url(transport, b'/hello%2Bthere?title=%D0%BF%D1%80%D0%B0%D0%B2%D0%BE%D0%B2%D0%B0%D1%8F+%D0%B7%D0%B0%D1%89%D0%B8%D1%82%D0%B0')
 
     assert transport.request.path == '/hello+there'
     assert transport.request.query['title'] == 'правовая защита'
@@ -21,9 +27,9 @@ def test_url_parsing_double_path():
     transport.request = Request()
     transport._parent.prefix = ''
 
-    transport.on_url = httptransport._HTTPServerProtocol.on_url
+    transport._parse_url = httptransport._HTTPServerProtocol._parse_url
 
-    transport.on_url(transport, b'//hello')
+    transport._parse_url(transport, b'//hello')
 
     assert transport.request.path == '/hello'
 
@@ -33,8 +39,214 @@ def test_url_parsing_strip_prefix():
     transport.request = Request()
     transport._parent.prefix = '/api'
 
-    transport.on_url = httptransport._HTTPServerProtocol.on_url
+    transport._parse_url = httptransport._HTTPServerProtocol._parse_url
+
+    transport._parse_url(transport, b'/api/hello')
+
+    assert transport.request.path == '/hello'
+
+
+def test_url_split_over_reads():
+    parent = httptransport.HTTPTransport()
+    parent.handle_incoming_request = mock.Mock()
+    loop = mock.Mock()
+    protocol = httptransport._HTTPServerProtocol(parent=parent, loop=loop)
+    for chunk in (b'GET /hel', b'lo/wor', b'ld?a=', b'1 HTTP/1.1\r\n\r\n'):
+        protocol.data_received(chunk)
+    assert protocol.request.path == '/hello/world'
+    assert protocol.request.query['a'] == '1'
+
+
+async def _hello(request):
+    return Response(body=b'hello', content_type='text/plain')
+
+
+def _serve(transport):
+    loop = asyncio.get_event_loop()
+    transport.listen(loop=loop, config={'debug': True})
+    task = loop.create_task(transport.start(_hello))
+    loop.run_until_complete(asyncio.sleep(0.01))
+    return task
+
+
+def _get(reader, writer):
+    async def get():
+        writer.write(b'GET /hello HTTP/1.1\r\nHost: localhost\r\n\r\n')
+        data = await reader.read()
+        writer.close()
+        return data
+    return get()
+
+
+def test_unix_socket(tmp_path):
+    path = str(tmp_path / 'waspy.sock')
+    # a socket file left behind by a previous run
+    stale = socket.socket(socket.AF_UNIX)
+    stale.bind(path)
+    stale.close()
+
+    loop = asyncio.get_event_loop()
+    transport = httptransport.HTTPTransport(unix_socket=path)
+    task = _serve(transport)
+    data = loop.run_until_complete(_get(
+        *loop.run_until_complete(asyncio.open_unix_connection(path))))
+    transport.shutdown()
+    loop.run_until_complete(task)
+    assert data.startswith(b'HTTP/1.1 200 OK')
+    assert not os.path.exists(path)
+
+
+def test_inherited_fd():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    sock.listen(10)
+    port = sock.getsockname()[1]
+
+    loop = asyncio.get_event_loop()
+    transport = httptransport.HTTPTransport(fd=sock.detach(),
+                                            tcp_nodelay=False)
+    task = _serve(transport)
+    data = loop.run_until_complete(_get(*loop.run_until_complete(
+        asyncio.open_connection('127.0.0.1', port))))
+    transport.shutdown()
+    loop.run_until_complete(task)
+    assert data.startswith(b'HTTP/1.1 200 OK')
+
+
+def test_unix_socket_and_fd_are_exclusive():
+    with pytest.raises(ValueError):
+        httptransport.HTTPTransport(unix_socket='/tmp/waspy.sock', fd=3)
+
+
+def _serve_slow(transport, release):
+    async def slow(request):
+        await release.wait()
+        return Response(body=b'done', content_type='text/plain')
+
+    loop = asyncio.get_event_loop()
+    transport.listen(loop=loop, config={'debug': False})
+    task = loop.create_task(transport.start(slow))
+    loop.run_until_complete(asyncio.sleep(0.01))
+    return task
+
+
+def test_shutdown_drains_requests_in_flight(tmp_path):
+    path = str(tmp_path / 'waspy.sock')
+    loop = asyncio.get_event_loop()
+    release = asyncio.Event()
+    transport = httptransport.HTTPTransport(
+        unix_socket=path, shutdown_wait_period=0, shutdown_grace_period=5)
+    task = _serve_slow(transport, release)
+    idle_reader, idle_writer = loop.run_until_complete(
+        asyncio.open_unix_connection(path))
+    busy = loop.run_until_complete(asyncio.open_unix_connection(path))
+    response = asyncio.ensure_future(_get(*busy))
+    loop.run_until_complete(asyncio.sleep(0.01))
+
+    transport.shutdown()
+    # the idle connection is closed without waiting for the busy one
+    assert loop.run_until_complete(
+        asyncio.wait_for(idle_reader.read(), 1)) == b''
+    assert not task.done()
+
+    release.set()
+    loop.run_until_complete(asyncio.wait_for(task, 1))
+    assert loop.run_until_complete(response).startswith(b'HTTP/1.1 200 OK')
+    idle_writer.close()
+
+
+def test_drain_aborts_after_grace_period(tmp_path):
+    path = str(tmp_path / 'waspy.sock')
+    loop = asyncio.get_event_loop()
+    transport = httptransport.HTTPTransport(
+        unix_socket=path, shutdown_wait_period=0, shutdown_grace_period=0.05)
+    task = _serve_slow(transport, asyncio.Event())
+    _, idle_writer = loop.run_until_complete(
+        asyncio.open_unix_connection(path))
+    response = asyncio.ensure_future(_get(*loop.run_until_complete(
+        asyncio.open_unix_connection(path))))
+    loop.run_until_complete(asyncio.sleep(0.01))
+
+    counts = loop.run_until_complete(transport._drain())
+    assert counts == {'drained': 0, 'idle_closed': 1, 'aborted': 1}
+    assert loop.run_until_complete(response) == b''
+    idle_writer.close()
+    transport.shutdown()
+    loop.run_until_complete(asyncio.wait_for(task, 1))
+
+
+def _limited_protocol(**limits):
+    parent = httptransport.HTTPTransport(**limits)
+    parent._handler = _hello
+    parent.compression_threshold = None
+    protocol = httptransport._HTTPServerProtocol(
+        parent=parent, loop=asyncio.get_event_loop())
+    transport = _MemoryTransport()
+    protocol.connection_made(transport)
+    return protocol, transport
+
+
+def _receive(protocol, transport, *chunks, wait=0.01):
+    for chunk in chunks:
+        protocol.data_received(chunk)
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(asyncio.sleep(wait))
+    protocol.connection_lost(None)
+    return bytes(transport.data)
+
+
+@pytest.mark.parametrize('chunks', [
+    (b'GET / HTTP/1.1\r\n', b'X-Big: ' + b'a' * 200),
+    (b'GET / HTTP/1.1\r\nX-Big: ' + b'a' * 200 + b'\r\n\r\n',),
+    (b'GET / HTTP/1.1\r\nX-Big: ' + b'a' * 200 + b'\r\n\r',
+     b'\n' + b'x' * 200),
+])
+def test_headers_too_large(chunks):
+    protocol, transport = _limited_protocol(max_header_size=100)
+    data = _receive(protocol, transport, *chunks, b'\r\n\r\n')
+    assert data.startswith(b'HTTP/1.1 431 Request Header Fields Too Large')
+    assert transport.is_closing()
+
+
+def test_headers_within_limit():
+    request = b'GET /hello HTTP/1.1\r\nHost: localhost\r\n\r\n'
+    protocol, transport = _limited_protocol(max_header_size=len(request))
+    data = _receive(protocol, transport, request[:10], request[10:])
+    assert data.startswith(b'HTTP/1.1 200 OK')
+
+
+def test_headers_end_split_over_reads_with_body():
+    head = (b'POST /hello HTTP/1.1\r\nHost: localhost\r\n'
+            b'Content-Length: 200\r\n\r\n')
+    protocol, transport = _limited_protocol(max_header_size=120)
+    data = _receive(protocol, transport, head[:-1], head[-1:] + b'x' * 200)
+    assert data.startswith(b'HTTP/1.1 200 OK')
+
+
+def test_body_too_large_is_rejected_before_reading_it():
+    protocol, transport = _limited_protocol(max_body_size=10)
+    data = _receive(protocol, transport,
+                    b'POST / HTTP/1.1\r\nContent-Length: 11\r\n\r\n')
+    assert data.startswith(b'HTTP/1.1 413 Request Entity Too Large')
+
+
+def test_chunked_body_too_large():
+    protocol, transport = _limited_protocol(max_body_size=10)
+    data = _receive(protocol, transport,
+                    b'POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n',
+                    b'6\r\nabcdef\r\n', b'6\r\nabcdef\r\n0\r\n\r\n')
+    assert data.startswith(b'HTTP/1.1 413 Request Entity Too Large')
+    assert protocol._task is None
 
-    transport.on_url(transport, b'/api/hello')
 
-    assert transport.request.path == '/hello'
\ No newline at end of file
+@pytest.mark.parametrize('chunks', [
+    (),
+    (b'GET / HTTP/1.1\r\nHost: loc',),
+    (b'POST / HTTP/1.1\r\nContent-Length: 10\r\n\r\nabc',),
+])
+def test_slow_requests_time_out(chunks):
+    protocol, transport = _limited_protocol(header_timeout=0.01,
+                                            body_timeout=0.01)
+    data = _receive(protocol, transport, *chunks, wait=0.05)
+    assert data.startswith(b'HTTP/1.1 408 Request Timeout')
+    assert transport.is_closing()
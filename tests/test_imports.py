@@ -0,0 +1,42 @@
+import subprocess
+import sys
+
+import pytest
+
+
+def _imported_after(statement):
+    result = subprocess.run(
+        [sys.executable, '-c',
+         f'import sys; {statement}; print(" ".join(sys.modules))'],
+        stdout=subprocess.PIPE, universal_newlines=True, check=True)
+    return set(result.stdout.split())
+
+
+def test_http_services_dont_import_amqp():
+    modules = _imported_after(
+        'from waspy import Application, Request, Response, Client')
+    assert 'aioamqp' not in modules
+    assert 'waspy.transports.rabbitmqtransport' not in modules
+    assert 'yaml' not in modules
+    assert 'aenum' not in modules
+
+
+def test_transports_are_imported_on_use():
+    modules = _imported_after('from waspy.transports import RabbitMQTransport')
+    assert 'aioamqp' in modules
+
+
+def test_unknown_attributes():
+    import waspy
+    import waspy.transports
+    with pytest.raises(AttributeError):
+        waspy.Nope
+    with pytest.raises(AttributeError):
+        waspy.transports.Nope
+    assert 'Application' in dir(waspy)
+
+
+def test_invalid_request_status_is_added_on_use():
+    modules = _imported_after(
+        'from waspy import Response; Response(status=430)')
+    assert 'aenum' in modules
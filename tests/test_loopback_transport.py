@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from waspy import Application, Config, Request
+from waspy.errorlogging import ErrorLoggingBase
+from waspy.transports.loopbacktransport import LoopbackTransport, \
+    LoopbackClientTransport, services
+
+
+def _start(app):
+    loop = asyncio.get_event_loop()
+    app.logger = ErrorLoggingBase()
+    loop.run_until_complete(app._wrap_handlers())
+    transport = app.transport[0]
+    transport.listen(loop=loop, config=app.config)
+    task = loop.create_task(transport.start(app.handle_request))
+    loop.run_until_complete(asyncio.sleep(0))
+    return task
+
+
+@pytest.fixture
+def apps():
+    received = []
+    users = Application(LoopbackTransport('users'),
+                        config=Config(_defaults={'debug': False}))
+
+    async def create_user(request):
+        received.append(request.body)
+        return {'created': request.body['name'],
+                'correlation_id': request.correlation_id}
+
+    users.router.post('/users', create_user)
+
+    front = Application(LoopbackTransport('front'),
+                        config=Config(_defaults={'debug': False}))
+
+    async def signup(request):
+        response = await request.app.client.post(
+            'users', '/users', body=request.body,
+            content_type='application/json')
+        return response
+
+    front.router.post('/signup', signup)
+    tasks = [_start(users), _start(front)]
+    yield front, received
+    for app in (users, front):
+        app.transport[0].shutdown()
+    asyncio.get_event_loop().run_until_complete(asyncio.gather(*tasks))
+
+
+def test_calls_are_dispatched_in_process(apps):
+    front, received = apps
+    body = {'name': 'bob'}
+    response = asyncio.get_event_loop().run_until_complete(
+        LoopbackClientTransport().make_request(
+            'front', 'POST', '/signup', body=body,
+            content_type='application/json', correlation_id='abc'))
+    assert response.status.value == 200
+    assert response.body == {'created': 'bob', 'correlation_id': 'abc'}
+    # nothing was encoded along the way
+    assert received[0] is body
+    assert response._raw_body is None
+
+
+def test_bytes_bodies_are_decoded_by_the_service(apps):
+    front, received = apps
+    response = asyncio.get_event_loop().run_until_complete(
+        LoopbackClientTransport().make_request(
+            'users', 'POST', 'users', body=b'{"name": "alice"}',
+            content_type='application/json'))
+    assert response.body['created'] == 'alice'
+    assert received == [{'name': 'alice'}]
+
+
+def test_services_are_unregistered_on_shutdown(apps):
+    assert set(services) == {'users', 'front'}
+    with pytest.raises(ValueError):
+        LoopbackTransport('users').listen(loop=asyncio.get_event_loop(),
+                                          config=None)
+
+
+def test_unknown_services_are_refused():
+    with pytest.raises(ConnectionRefusedError):
+        asyncio.get_event_loop().run_until_complete(
+            LoopbackClientTransport().make_request('nope', 'GET', '/'))
+    assert services == {}
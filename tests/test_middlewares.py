@@ -1,4 +1,7 @@
 import asyncio
+from collections import OrderedDict
+
+import pytest
 
 from waspy import Application, Request, Response
 
@@ -34,3 +37,127 @@ def test_that_middleware_wrapping_works():
     result.app = app
     assert isinstance(result, Response)
     assert result.original_body == 'c'
+
+
+def _tagging_factory(tag):
+    async def factory(app, handler):
+        async def middleware(request):
+            request.tags.append(tag)
+            return await handler(request)
+        return middleware
+    return factory
+
+
+def _run(app, path):
+    request = Request(method='GET', path=path)
+    request.tags = []
+    loop = asyncio.get_event_loop()
+    handler = app.router.get_handler_for_request(request)
+    loop.run_until_complete(handler(request))
+    return request.tags
+
+
+def test_per_route_middleware_selection():
+    a, b, c = (_tagging_factory(tag) for tag in 'abc')
+
+    async def handle(request):
+        return 'ok'
+
+    app = Application(middlewares=(a, b, c))
+    app.router.get('/all', handle)
+    app.router.get('/only', handle, middlewares=(a, c))
+    app.router.get('/except', handle, exclude_middlewares=(b,))
+    app.router.get('/none', handle, middlewares=())
+    asyncio.get_event_loop().run_until_complete(app._wrap_handlers())
+
+    assert _run(app, '/all') == ['a', 'b', 'c']
+    assert _run(app, '/only') == ['a', 'c']
+    assert _run(app, '/except') == ['a', 'c']
+    assert _run(app, '/none') == []
+
+
+def test_chains_are_shared_between_routes():
+    calls = []
+
+    async def counting_factory(app, handler):
+        calls.append(handler)
+        return handler
+
+    async def handle(request):
+        return 'ok'
+
+    app = Application(middlewares=(counting_factory,))
+    app.router.get('/one', handle)
+    app.router.get('/two', handle)
+    app.router.get('/three', handle, middlewares=())
+    asyncio.get_event_loop().run_until_complete(app._wrap_handlers())
+    assert len(calls) == 1
+    assert (app.router.get_handler_for_request(Request(path='/one')) is
+            app.router.get_handler_for_request(Request(path='/two')))
+
+
+def test_unknown_route_middleware():
+    async def handle(request):
+        return 'ok'
+
+    app = Application()
+    app.router.get('/', handle, middlewares=(_tagging_factory('a'),))
+    with pytest.raises(ValueError):
+        asyncio.get_event_loop().run_until_complete(app._wrap_handlers())
+
+
+def test_response_handlers_skip_the_response_wrapper():
+    async def annotated(request) -> Response:
+        return Response(body='a')
+
+    async def plain(request):
+        return Response(body='b')
+
+    app = Application()
+    app.router.get('/annotated', annotated)
+    app.router.get('/plain', plain)
+    app.router.get('/flagged', plain, returns_response=True)
+    app.router.get('/forced', annotated, returns_response=False)
+    asyncio.get_event_loop().run_until_complete(app._wrap_handlers())
+
+    def handler_for(path):
+        return app.router.get_handler_for_request(Request(path=path))
+
+    assert handler_for('/annotated') is annotated
+    assert handler_for('/flagged') is plain
+    assert handler_for('/plain') is not plain
+    assert handler_for('/forced') is not annotated
+
+
+@pytest.mark.parametrize('result,status,body', [
+    ({'a': 1}, 200, {'a': 1}),
+    (OrderedDict(a=1), 200, {'a': 1}),
+    ('text', 200, 'text'),
+    (({'a': 1}, 201), 201, {'a': 1}),
+    (None, 204, None),
+])
+def test_response_wrapper_conversions(result, status, body):
+    async def handle(request):
+        return result
+
+    app = Application()
+    app.router.get('/', handle)
+    asyncio.get_event_loop().run_until_complete(app._wrap_handlers())
+    request = Request(path='/')
+    handler = app.router.get_handler_for_request(request)
+    response = asyncio.get_event_loop().run_until_complete(handler(request))
+    assert response.status.value == status
+    assert response.original_body == body
+
+
+def test_response_wrapper_rejects_other_types():
+    async def handle(request):
+        return 42
+
+    app = Application()
+    app.router.get('/', handle)
+    asyncio.get_event_loop().run_until_complete(app._wrap_handlers())
+    request = Request(path='/')
+    handler = app.router.get_handler_for_request(request)
+    with pytest.raises(ValueError):
+        asyncio.get_event_loop().run_until_complete(handler(request))
@@ -0,0 +1,101 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from waspy.listeners.rabbitmq_listener import RabbitMQTransportListener
+
+
+class _AckChannel:
+    def __init__(self):
+        self.acks = []
+        self.nacks = []
+
+    async def basic_client_ack(self, delivery_tag, multiple=False):
+        self.acks.append((delivery_tag, multiple))
+
+    async def basic_client_nack(self, delivery_tag, multiple=False,
+                                requeue=True):
+        self.nacks.append((delivery_tag, multiple, requeue))
+
+
+class BatchListener(RabbitMQTransportListener):
+    batch_size = 3
+    batch_timeout = 0.01
+
+    def __init__(self, fail=False):
+        super().__init__()
+        self.channel = _AckChannel()
+        self.batches = []
+        self.fail = fail
+
+    async def handle_work(self, data, **kwargs):
+        pass
+
+    async def handle_batch(self, data, *, envelopes, properties):
+        self.batches.append(data)
+        if self.fail:
+            raise ValueError('bulk insert failed')
+
+
+def _deliver(listener, tag):
+    envelope = SimpleNamespace(delivery_tag=tag)
+    return listener._handle_work(None, json.dumps({'n': tag}), envelope,
+                                 SimpleNamespace())
+
+
+def test_full_batch_is_acked_as_a_unit():
+    loop = asyncio.get_event_loop()
+    listener = BatchListener()
+    for tag in range(1, 7):
+        loop.run_until_complete(_deliver(listener, tag))
+    assert listener.batches == [[{'n': 1}, {'n': 2}, {'n': 3}],
+                                [{'n': 4}, {'n': 5}, {'n': 6}]]
+    assert listener.channel.acks == [(3, True), (6, True)]
+
+
+def test_partial_batch_flushes_on_timeout():
+    loop = asyncio.get_event_loop()
+    listener = BatchListener()
+    loop.run_until_complete(_deliver(listener, 1))
+    assert listener.batches == []
+    loop.run_until_complete(asyncio.sleep(0.05))
+    assert listener.batches == [[{'n': 1}]]
+    assert listener.channel.acks == [(1, True)]
+
+
+def test_failed_batch_is_nacked():
+    loop = asyncio.get_event_loop()
+    listener = BatchListener(fail=True)
+    loop.run_until_complete(_deliver(listener, 1))
+    loop.run_until_complete(_deliver(listener, 2))
+    with pytest.raises(ValueError):
+        loop.run_until_complete(_deliver(listener, 3))
+    assert listener.channel.acks == []
+    assert listener.channel.nacks == [(3, True, True)]
+
+
+def test_undecodable_message_in_batch_is_nacked():
+    loop = asyncio.get_event_loop()
+    listener = BatchListener()
+    loop.run_until_complete(_deliver(listener, 1))
+    with pytest.raises(ValueError):
+        loop.run_until_complete(listener._handle_work(
+            None, b'not json', SimpleNamespace(delivery_tag=2),
+            SimpleNamespace()))
+    loop.run_until_complete(_deliver(listener, 3))
+    loop.run_until_complete(_deliver(listener, 4))
+    assert listener.batches == [[{'n': 1}, {'n': 3}, {'n': 4}]]
+    # requeueing would redeliver it forever
+    assert listener.channel.nacks == [(2, False, False)]
+    assert listener.channel.acks == [(4, True)]
+
+
+def test_failed_timed_out_batch_is_logged(caplog):
+    loop = asyncio.get_event_loop()
+    listener = BatchListener(fail=True)
+    loop.run_until_complete(_deliver(listener, 1))
+    loop.run_until_complete(asyncio.sleep(0.05))
+    assert listener.channel.nacks == [(1, True, True)]
+    assert 'Handling a batch' in caplog.text
@@ -1,6 +1,12 @@
+import asyncio
+from types import SimpleNamespace
+
 import pytest
-from waspy.router import Methods
-from waspy.transports.rabbitmqtransport import parse_url_to_topic
+from waspy.router import Methods, Router
+from waspy.webtypes import Response
+from waspy.transports.rabbitmqtransport import parse_url_to_topic, \
+    RabbitMQClientTransport, RabbitMQTransport, routing_key_to_path, \
+    path_to_routing_key, minimal_topic_set
 
 
 @pytest.mark.parametrize("url,expected_topic", [
@@ -17,4 +23,178 @@ from waspy.transports.rabbitmqtransport import parse_url_to_topic
     ((Methods.GET, '/test/test'), "get.test.test"),
 ])
 def test_url_to_topic(url, expected_topic):
-    assert parse_url_to_topic(*url) == expected_topic
\ No newline at end of file
+    assert parse_url_to_topic(*url) == expected_topic
+
+class _LocalBroker:
+    """ Stands in for an amqp channel. Replies are delivered straight back
+        into the client before `basic_publish` returns, unless `drop` is set.
+    """
+    def __init__(self, client, drop=False):
+        self.client = client
+        self.drop = drop
+        self.published = []
+
+    async def basic_publish(self, *, exchange_name, routing_key, properties,
+                            payload, mandatory):
+        self.published.append((routing_key, properties))
+        if self.drop:
+            return
+        reply = SimpleNamespace(message_id=properties['message_id'],
+                                correlation_id=properties['correlation_id'],
+                                headers={'Status': '200'},
+                                content_type='application/json',
+                                content_encoding=None)
+        await self.client.handle_responses(self, b'{"ok": true}', None, reply)
+
+
+def _client_with_broker(drop=False):
+    client = RabbitMQClientTransport(url='localhost')
+    client._connected = True
+    client._channel_ready.set()
+    client.channel = _LocalBroker(client, drop=drop)
+    return client
+
+
+def test_fast_reply_resolves_request():
+    loop = asyncio.get_event_loop()
+    client = _client_with_broker()
+    response = loop.run_until_complete(
+        client.make_request('service', 'GET', '/foo', timeout=1))
+    assert response.status.value == 200
+    assert client._response_futures == {}
+
+
+def test_expiration_is_sent():
+    loop = asyncio.get_event_loop()
+    client = _client_with_broker()
+    loop.run_until_complete(
+        client.make_request('service', 'GET', '/foo', timeout=1.5))
+    _, properties = client.channel.published[0]
+    assert properties['expiration'] == '1500'
+
+
+def test_timeouts_do_not_leak_futures():
+    loop = asyncio.get_event_loop()
+    client = _client_with_broker(drop=True)
+
+    async def call():
+        with pytest.raises(asyncio.TimeoutError):
+            await client.make_request('service', 'GET', '/foo', timeout=0.01)
+
+    for _ in range(5):
+        loop.run_until_complete(asyncio.gather(*(call() for _ in range(200))))
+        assert client._response_futures == {}
+    assert len(client.channel.published) == 1000
+
+
+def test_late_reply_is_ignored():
+    loop = asyncio.get_event_loop()
+    client = _client_with_broker()
+    reply = SimpleNamespace(message_id='gone', correlation_id='c',
+                            headers={'Status': '200'},
+                            content_type='application/json',
+                            content_encoding=None)
+    loop.run_until_complete(client.handle_responses(None, b'null', None, reply))
+    assert client._response_futures == {}
+
+
+@pytest.mark.parametrize("routing_key,expected", [
+    ('get.single', (Methods.GET, 'single')),
+    ('get.foo.12.bar', (Methods.GET, 'foo/12/bar')),
+    ('post.file.report?csv', (Methods.POST, 'file/report.csv')),
+    ('put.hello%2Bthere', (Methods.PUT, 'hello+there')),
+    ('publish.events.created', (Methods.PUBLISH, 'events/created')),
+    ('events.created', (Methods.POST, 'events/created')),
+    ('get', (Methods.GET, '')),
+])
+def test_routing_key_to_path(routing_key, expected):
+    assert routing_key_to_path(routing_key) == expected
+
+
+@pytest.mark.parametrize("method,path,expected", [
+    ('GET', '/single', 'get.single'),
+    ('GET', 'foo/12/bar', 'get.foo.12.bar'),
+    ('POST', '/file/report.csv', 'post.file.report?csv'),
+    ('PUBLISH', '/events/created', 'events.created'),
+])
+def test_path_to_routing_key(method, path, expected):
+    assert path_to_routing_key(method, path) == expected
+
+
+@pytest.mark.parametrize("topics,owned,expected", [
+    (['get.foo.*', 'get.foo.*'], (), {'get.foo.*'}),
+    (['get.foo.*', 'get.foo.bar'], (), {'get.foo.*'}),
+    (['get.foo.*', 'get.foo.bar.baz'], (), {'get.foo.*', 'get.foo.bar.baz'}),
+    (['get.foo.*', 'post.foo.bar'], (), {'get.foo.*', 'post.foo.bar'}),
+    (['get.#', 'get.foo.*', 'post.foo'], (), {'get.#', 'post.foo'}),
+    (['get.foo', 'get.foo.*', 'get.foo.*.bar', 'get.other'], ('/foo',),
+     {'get.foo.#', 'get.other'}),
+    (['get.foobar', 'get.foo.*'], ('/foo',), {'get.foo.#', 'get.foobar'}),
+])
+def test_minimal_topic_set(topics, owned, expected):
+    assert minimal_topic_set(topics, owned_prefixes=owned) == expected
+
+
+class _BindingChannel:
+    def __init__(self):
+        self.binds = []
+        self.unbinds = []
+
+    async def queue_bind(self, *, exchange_name, queue_name, routing_key,
+                         no_wait):
+        self.binds.append((routing_key, no_wait))
+
+    async def queue_unbind(self, *, exchange_name, queue_name, routing_key):
+        self.unbinds.append(routing_key)
+
+
+def test_register_router_reconciles_bindings():
+    loop = asyncio.get_event_loop()
+    transport = RabbitMQTransport(url='localhost', queue='q')
+    transport.channel = _BindingChannel()
+
+    router = Router()
+    router.get('/foo/{id}', 1)
+    router.get('/foo/{id}:action', 2)
+    router.get('/foo/bar', 3)
+    router.post('/foo', 4)
+    loop.run_until_complete(transport.register_router(router))
+    assert transport.channel.binds == [('get.foo.*', True),
+                                       ('post.foo', False)]
+
+    router.delete('/foo/{id}', 5)
+    router.urls.remove((Methods.POST, 'foo'))
+    transport.channel.binds = []
+    loop.run_until_complete(transport.register_router(router))
+    assert transport.channel.binds == [('delete.foo.*', False)]
+    assert transport.channel.unbinds == ['post.foo']
+
+
+def test_shutdown_drains_requests_in_flight():
+    loop = asyncio.get_event_loop()
+    transport = RabbitMQTransport(url='localhost', shutdown_grace_period=0.05)
+    transport._channel_ready.set()
+    published = []
+
+    async def handler(request):
+        await asyncio.sleep(10 if request.path == 'slow' else 0.01)
+        return Response(body=b'ok', content_type='text/plain')
+
+    async def basic_publish(**kwargs):
+        published.append(kwargs['routing_key'])
+
+    transport._handler = handler
+    channel = SimpleNamespace(basic_publish=basic_publish)
+    for routing_key in ('get.fast', 'get.slow'):
+        properties = SimpleNamespace(
+            headers=None, correlation_id=None, message_id=routing_key,
+            reply_to='replies', content_type=None, content_encoding=None)
+        envelope = SimpleNamespace(routing_key=routing_key, delivery_tag=1)
+        loop.run_until_complete(transport.handle_request(
+            channel, b'', envelope, properties))
+
+    counts = loop.run_until_complete(transport._drain())
+    assert counts == {'drained': 1, 'cancelled': 1}
+    assert published == ['replies']
+    loop.run_until_complete(asyncio.sleep(0))
+    assert not transport._tasks
@@ -36,9 +36,9 @@ def router():
     handler_gen = router_._get_and_wrap_routes()
 
     try:
-        handler = next(handler_gen)
+        handler, _ = next(handler_gen)
         while True:
-            handler = handler_gen.send(handler)
+            handler, _ = handler_gen.send(handler)
     except StopIteration:
         pass
 
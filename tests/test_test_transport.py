@@ -0,0 +1,87 @@
+import asyncio
+import json
+
+from waspy import Application, Request
+from waspy.transports import testtransport
+
+
+def _app():
+    app = Application(testtransport.TestTransport())
+    started = []
+    app.on_start.append(started.append)
+
+    async def slow(request):
+        await asyncio.sleep(0.05)
+        return {'id': request.path_params['id']}
+
+    app.router.get('/slow/{id}', slow)
+    return app, started
+
+
+def test_requests_are_handled_concurrently():
+    app, started = _app()
+    transport = app.transport[0]
+
+    async def scenario():
+        await transport.start_app(app)
+        assert started == [app]
+        requests = [Request(path=f'/slow/{i}') for i in range(20)]
+        start = asyncio.get_event_loop().time()
+        responses, latencies = await transport.send_concurrent(requests)
+        elapsed = asyncio.get_event_loop().time() - start
+        await transport.stop_app()
+        return responses, latencies, elapsed
+
+    responses, latencies, elapsed = \
+        asyncio.get_event_loop().run_until_complete(scenario())
+    assert [r.body for r in responses] == [{'id': str(i)} for i in range(20)]
+    assert len(latencies) == 20 and min(latencies) >= 0.05
+    # 20 sequential requests would take a second
+    assert elapsed < 0.5
+
+
+def test_concurrency_limit():
+    app, _ = _app()
+    transport = app.transport[0]
+
+    async def scenario():
+        await transport.start_app(app)
+        requests = [Request(path=f'/slow/{i}') for i in range(4)]
+        start = asyncio.get_event_loop().time()
+        _, latencies = await transport.send_concurrent(requests,
+                                                       concurrency=1)
+        return latencies, asyncio.get_event_loop().time() - start
+
+    latencies, elapsed = asyncio.get_event_loop().run_until_complete(
+        scenario())
+    # latencies dont include waiting for a turn
+    assert max(latencies) < 0.15
+    assert elapsed >= 0.2
+
+
+def test_raw_http_in_memory():
+    app, _ = _app()
+    transport = app.transport[0]
+
+    async def scenario():
+        await transport.start_app(app)
+        return await transport.send_http(
+            b'GET /slow/7 HTTP/1.1\r\nHost: localhost\r\n\r\n',
+            chunk_size=5)
+
+    data = asyncio.get_event_loop().run_until_complete(scenario())
+    head, _, body = data.partition(b'\r\n\r\n')
+    assert head.startswith(b'HTTP/1.1 200 OK')
+    assert json.loads(body) == {'id': '7'}
+
+
+def test_invalid_http_in_memory():
+    app, _ = _app()
+    transport = app.transport[0]
+
+    async def scenario():
+        await transport.start_app(app)
+        return await transport.send_http(b'NOT HTTP\r\n\r\n')
+
+    data = asyncio.get_event_loop().run_until_complete(scenario())
+    assert data.startswith(b'HTTP/1.1 400')
@@ -0,0 +1,109 @@
+import asyncio
+import json
+
+import pytest
+
+from waspy import Application, Request
+from waspy.errorlogging import ErrorLoggingBase
+from waspy.validation import RequestValidator, SchemaError
+
+
+USER_SCHEMA = {
+    'type': 'object',
+    'required': ['name'],
+    'additionalProperties': False,
+    'properties': {
+        'name': {'type': 'string', 'minLength': 1},
+        'age': {'type': 'integer', 'minimum': 0},
+        'tags': {'type': 'array', 'items': {'type': 'string'}},
+        'role': {'enum': ['admin', 'user']},
+    }
+}
+
+
+def _errors(validator, **kwargs):
+    request = Request(**kwargs)
+    return validator(request)
+
+
+@pytest.mark.parametrize('body,expected', [
+    ({'name': 'bob'}, None),
+    ({'name': 'bob', 'age': 3, 'tags': ['a'], 'role': 'user'}, None),
+    ({}, [{'location': 'body.name', 'message': 'is required'}]),
+    ({'name': ''}, [{'location': 'body.name',
+                     'message': 'must be at least 1 long'}]),
+    ({'name': 'bob', 'age': True}, [{'location': 'body.age',
+                                     'message': 'must be integer'}]),
+    ({'name': 'bob', 'age': -1}, [{'location': 'body.age',
+                                   'message': 'must be at least 0'}]),
+    ({'name': 'bob', 'tags': ['a', 1]}, [{'location': 'body.tags[1]',
+                                          'message': 'must be string'}]),
+    ({'name': 'bob', 'role': 'root'}, [
+        {'location': 'body.role',
+         'message': "must be one of ['admin', 'user']"}]),
+    ({'name': 'bob', 'extra': 1}, [{'location': 'body.extra',
+                                    'message': 'is not allowed'}]),
+    ([], [{'location': 'body', 'message': 'must be object'}]),
+])
+def test_body_validation(body, expected):
+    validator = RequestValidator(body=USER_SCHEMA)
+    assert _errors(validator, body=body,
+                   content_type='application/json') == expected
+
+
+def test_query_and_path_parameters_are_read_from_strings():
+    validator = RequestValidator(
+        query={'required': ['page'],
+               'properties': {'page': {'type': 'integer', 'minimum': 1},
+                              'full': {'type': 'boolean'}}},
+        path={'properties': {'id': {'pattern': '^[0-9a-f]+$'}}})
+    request = Request(query_string='page=2&full=true')
+    request.path_params = {'id': 'beef'}
+    assert validator(request) is None
+
+    request = Request(query_string='page=0&full=maybe')
+    request.path_params = {'id': 'xyz'}
+    assert validator(request) == [
+        {'location': 'path.id', 'message': 'must match ^[0-9a-f]+$'},
+        {'location': 'query.page', 'message': 'must be at least 1'},
+        {'location': 'query.full', 'message': 'must be boolean'},
+    ]
+
+    request = Request()
+    request.path_params = {}
+    assert validator(request) == [
+        {'location': 'query.page', 'message': 'is required'}]
+
+
+def test_invalid_schemas_fail_when_compiled():
+    with pytest.raises(SchemaError):
+        RequestValidator(body={'type': 'thing'})
+
+
+def test_invalid_requests_are_rejected_before_the_handler():
+    calls = []
+
+    async def create(request):
+        calls.append(request.body)
+        return {'created': request.body['name']}
+
+    app = Application()
+    app.router.post('/users', create, body_schema=USER_SCHEMA)
+    app.logger = ErrorLoggingBase()
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(app._wrap_handlers())
+
+    response = loop.run_until_complete(app.handle_request(Request(
+        method='POST', path='/users', body=b'{"age": "old"}',
+        content_type='application/json')))
+    assert response.status.value == 430
+    assert json.loads(response.raw_body)['errors'] == [
+        {'location': 'body.name', 'message': 'is required'},
+        {'location': 'body.age', 'message': 'must be integer'}]
+    assert calls == []
+
+    response = loop.run_until_complete(app.handle_request(Request(
+        method='POST', path='/users', body=b'{"name": "bob"}',
+        content_type='application/json')))
+    assert response.status.value == 200
+    assert calls == [{'name': 'bob'}]
@@ -1,3 +1,5 @@
+import pytest
+
 from waspy import webtypes
 
 
@@ -26,3 +28,29 @@ def test_cookie_parsing():
     assert r.cookies['test1'] == 'abc'
 
 
+def test_query_params_decoding():
+    query = webtypes.QueryParams.from_string(
+        'q=hello+world&tag=a%26b&tag=c&empty=&flag&na%6De=x')
+    assert query['q'] == 'hello world'
+    assert query.getall('tag') == ['a&b', 'c']
+    assert query.get('empty') is None
+    assert 'flag' not in query
+    assert query['name'] == 'x'
+    assert len(query) == 3
+    query.add('tag', 'd')
+    query.add('new', 'value')
+    assert query.getall('tag') == ['a&b', 'c', 'd']
+    assert query.get('new') == 'value'
+
+
+def test_query_params_missing_key():
+    query = webtypes.QueryParams.from_string('')
+    with pytest.raises(KeyError) as e:
+        query['missing']
+    assert 'missing' in str(e.value)
+
+
+def test_empty_query_is_parsed_once():
+    request = webtypes.Request(query_string=None)
+    assert request.query is request.query
+    assert len(request.query) == 0
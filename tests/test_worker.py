@@ -0,0 +1,172 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from waspy import Worker, Task
+from waspy.ctx import request_context
+from waspy.worker import EXECUTORS
+from waspy.exceptions import RetryTask, RejectTask, RequeueTask
+from waspy.transports import RabbitMQWorkerTransport
+
+
+class _WorkerChannel:
+    def __init__(self):
+        self.acks = []
+        self.nacks = []
+        self.published = []
+        self.declared = {}
+
+    async def basic_client_ack(self, delivery_tag, multiple=False):
+        self.acks.append(delivery_tag)
+
+    async def basic_client_nack(self, delivery_tag, multiple=False,
+                                requeue=True):
+        self.nacks.append((delivery_tag, requeue))
+
+    async def basic_publish(self, *, exchange_name, routing_key, properties,
+                            payload):
+        self.published.append((routing_key, properties, payload))
+
+    async def queue_declare(self, *, queue_name, durable, arguments):
+        self.declared[queue_name] = arguments
+
+
+def _transport(handler, **kwargs):
+    transport = RabbitMQWorkerTransport(url='localhost', queue='jobs',
+                                        **kwargs)
+    transport._handler = handler
+    transport._semaphore = asyncio.Semaphore(transport.concurrency)
+    transport._declare_lock = asyncio.Lock()
+    return transport
+
+
+def _deliver(transport, channel, tag=1, attempt=None):
+    headers = {}
+    if attempt:
+        headers[transport.ATTEMPT_HEADER] = attempt
+    properties = SimpleNamespace(headers=headers, correlation_id='abc',
+                                 content_type='application/json',
+                                 message_id=str(tag))
+    envelope = SimpleNamespace(delivery_tag=tag, routing_key='jobs')
+
+    async def deliver():
+        await transport.handle_message(channel, b'{"n": 1}', envelope,
+                                       properties)
+        await asyncio.gather(*transport._tasks)
+    asyncio.get_event_loop().run_until_complete(deliver())
+
+
+def _raises(exc):
+    async def handler(task):
+        raise exc
+    return handler
+
+
+def test_success_acks():
+    tasks = []
+
+    async def handler(task):
+        tasks.append(task)
+
+    channel = _WorkerChannel()
+    _deliver(_transport(handler), channel)
+    assert channel.acks == [1]
+    assert tasks[0].attempt == 1
+    assert tasks[0].name == 'jobs'
+
+
+@pytest.mark.parametrize('exc,requeue', [
+    (RejectTask(), False),
+    (RequeueTask(), True),
+])
+def test_reject_and_requeue(exc, requeue):
+    channel = _WorkerChannel()
+    _deliver(_transport(_raises(exc)), channel)
+    assert channel.acks == []
+    assert channel.nacks == [(1, requeue)]
+
+
+def test_retry_goes_through_delay_queue():
+    channel = _WorkerChannel()
+    transport = _transport(_raises(ValueError()), retry_delay=2,
+                           retry_backoff=3)
+    _deliver(transport, channel, attempt=2)
+
+    routing_key, properties, payload = channel.published[0]
+    assert routing_key == 'jobs.delay.6000'
+    assert properties['headers'][transport.ATTEMPT_HEADER] == 3
+    assert payload == b'{"n": 1}'
+    assert channel.declared['jobs.delay.6000'] == {
+        'x-dead-letter-exchange': '',
+        'x-dead-letter-routing-key': 'jobs',
+        'x-message-ttl': 6000,
+    }
+    assert channel.acks == [1]
+
+
+def test_explicit_retry_delay():
+    channel = _WorkerChannel()
+    _deliver(_transport(_raises(RetryTask(delay=0.5))), channel)
+    assert channel.published[0][0] == 'jobs.delay.500'
+
+
+def test_out_of_retries_rejects():
+    channel = _WorkerChannel()
+    _deliver(_transport(_raises(RetryTask()), max_retries=2), channel,
+             attempt=3)
+    assert channel.published == []
+    assert channel.nacks == [(1, False)]
+
+
+def test_errors_reject_without_retry_on_error():
+    channel = _WorkerChannel()
+    _deliver(_transport(_raises(ValueError()), retry_on_error=False), channel)
+    assert channel.nacks == [(1, False)]
+
+
+def test_concurrency_is_bounded():
+    running = []
+    peak = []
+
+    async def handler(task):
+        running.append(task)
+        peak.append(len(running))
+        await asyncio.sleep(0.01)
+        running.remove(task)
+
+    channel = _WorkerChannel()
+    transport = _transport(handler, concurrency=2)
+
+    async def deliver_many():
+        for tag in range(6):
+            envelope = SimpleNamespace(delivery_tag=tag, routing_key='jobs')
+            properties = SimpleNamespace(headers={}, correlation_id=None,
+                                         content_type=None, message_id=None)
+            await transport.handle_message(channel, b'null', envelope,
+                                           properties)
+        await asyncio.gather(*transport._tasks)
+
+    asyncio.get_event_loop().run_until_complete(deliver_many())
+    assert max(peak) == 2
+    assert sorted(channel.acks) == list(range(6))
+
+
+def cpu_bound(task):
+    return (sum(range(task.body['n'] * 1000)),
+            request_context.get()['correlation_id'])
+
+
+@pytest.mark.parametrize('executor', ['thread', 'process'])
+def test_worker_executor(executor):
+    worker = Worker(RabbitMQWorkerTransport(url='localhost', queue='jobs'),
+                    cpu_bound, executor=executor, max_workers=1)
+    worker._pool = EXECUTORS[executor](max_workers=1)
+    task = Task(body=b'{"n": 2}', content_type='application/json',
+                correlation_id='abc')
+    try:
+        result = asyncio.get_event_loop().run_until_complete(
+            worker.handle_task(task))
+    finally:
+        worker._pool.shutdown()
+    assert result == (sum(range(2000)), 'abc')
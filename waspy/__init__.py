@@ -1,5 +1,34 @@
-from .app import Application
-from .webtypes import Request, Response, QueryParams
-from .exceptions import ResponseError, NotRoutableError, ParseError
-from .configuration import Config
-from .client import Client
+# Submodules are imported on first use (PEP 562), so a service only pays
+# for what it touches: `waspy.Request` does not import the transports.
+import importlib
+
+_LAZY = {
+    'Application': '.app',
+    'Request': '.webtypes',
+    'Response': '.webtypes',
+    'QueryParams': '.webtypes',
+    'Task': '.webtypes',
+    'ResponseError': '.exceptions',
+    'NotRoutableError': '.exceptions',
+    'ParseError': '.exceptions',
+    'Config': '.configuration',
+    'Client': '.client',
+    'Worker': '.worker',
+}
+
+__all__ = tuple(_LAZY)
+
+
+def __getattr__(name):
+    try:
+        module = _LAZY[name]
+    except KeyError:
+        raise AttributeError(
+            f'module {__name__!r} has no attribute {name!r}') from None
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
@@ -9,16 +9,18 @@ from concurrent.futures import CancelledError
 from contextvars import ContextVar, copy_context
 from copy import copy
 
-from .parser import ParserABC, JSONParser, parsers as app_parsers
+from .parser import ParserABC, JSONParser, parsers as app_parsers, \
+    negotiate_content_type
 from ._cors import CORSHandler
 from .client import Client
 from .webtypes import Request, Response
-from .exceptions import ResponseError, UnsupportedMediaType
+from .exceptions import ResponseError, UnsupportedMediaType, \
+    InvalidRequest, NackMePleaseError
 from .router import Router
 from .transports.transportabc import TransportABC
-from .transports.rabbitmqtransport import NackMePleaseError
 from .configuration import Config, ConfigError
-from .ctx import request_context
+from .ctx import request_context, call_with_context
+from .worker import EXECUTORS
 from . import errorlogging
 
 
@@ -26,27 +28,99 @@ logging.basicConfig(format='%(asctime)s %(levelname)s [%(module)s.%(funcName)s]
 logger = logging.getLogger('waspy')
 
 
+def _response_from_tuple(result):
+    body = result[0]
+    status = result[1]
+    return Response(status=status, body=body)
+
+
+def _response_from_body(result):
+    return Response(body=result)
+
+
+def _no_content_response(result):
+    return Response(status=HTTPStatus.NO_CONTENT)
+
+
+# How each type a handler may return is turned into a Response. Subclasses
+# of these types are added the first time they are seen.
+_RESPONSE_CONVERTERS = {
+    tuple: _response_from_tuple,
+    dict: _response_from_body,
+    str: _response_from_body,
+    type(None): _no_content_response,
+}
+
+
+def _convert_response(result):
+    result_type = type(result)
+    converter = _RESPONSE_CONVERTERS.get(result_type)
+    if converter is None:
+        if isinstance(result, Response):
+            return result
+        for known_type, converter in tuple(_RESPONSE_CONVERTERS.items()):
+            if isinstance(result, known_type):
+                _RESPONSE_CONVERTERS[result_type] = converter
+                break
+        else:
+            raise ValueError('Request handler returned an invalid type.'
+                             ' Return types should be one of '
+                             '[Response, dict, str, None, (dict, int)]')
+    return converter(result)
+
+
 async def response_wrapper_factory(app, handler):
     @wraps(handler)
     async def wrap_response_middleware(request):
-        response = await handler(request)
-        if not isinstance(response, Response):
-            if isinstance(response, tuple):
-                body = response[0]
-                status = response[1]
-                response = Response(status=status, body=body)
-            elif isinstance(response, dict) or isinstance(response, str):
-                response = Response(body=response)
-            elif response is None:
-                response = Response(status=HTTPStatus.NO_CONTENT)
-            else:
-                raise ValueError('Request handler returned an invalid type.'
-                                 ' Return types should be one of '
-                                 '[Response, dict, str, None, (dict, int)]')
-        return response
+        return _convert_response(await handler(request))
     return wrap_response_middleware
 
 
+def returns_response(handler) -> bool:
+    """ Whether a handlers return annotation says it returns a Response """
+    annotation = getattr(handler, '__annotations__', {}).get('return')
+    if isinstance(annotation, str):
+        # postponed evaluation of annotations
+        return annotation.rsplit('.', 1)[-1] == Response.__name__
+    return isinstance(annotation, type) and issubclass(annotation, Response)
+
+
+def executor_handler_factory(app, handler, executor):
+    """ Turns a synchronous handler into a coroutine that runs
+        it in one of the applications pools """
+    pool = app.get_executor(executor)
+
+    @wraps(handler)
+    async def run_in_executor(request):
+        loop = asyncio.get_event_loop()
+        if executor == 'thread':
+            return await loop.run_in_executor(
+                pool, copy_context().run, handler, request)
+
+        # Only plain data can cross the process boundary, so decode the
+        # body here and leave the app and handler behind.
+        _ = request.body
+        detached = copy(request)
+        detached.app = None
+        detached._handler = None
+        return await loop.run_in_executor(
+            pool, call_with_context, request_context.get(), handler,
+            detached)
+    return run_in_executor
+
+
+def validation_handler_factory(handler, validator):
+    """ Rejects requests that dont match the routes schemas
+        before the handler is called """
+    @wraps(handler)
+    async def validate_request(request):
+        errors = validator(request)
+        if errors:
+            raise InvalidRequest(errors)
+        return await handler(request)
+    return validate_request
+
+
 class Application:
     def __init__(self,
                  transport: Union[TransportABC,
@@ -59,7 +133,18 @@ class Application:
                  config: Config=None,
                  loop=None,
                  parsers=None,
-                 default_content_type='application/json'):
+                 default_content_type='application/json',
+                 offload_encoding_threshold: int=256 * 1024,
+                 config_watch_interval: float=None):
+        """
+        :param offload_encoding_threshold: responses of handlers that
+            produced a dict or list body of at least this many bytes are
+            encoded in the applications thread pool from then on, so big
+            exports dont stall other requests. `None` disables it.
+        :param config_watch_interval: seconds between checks of the config
+            file for changes, which are then loaded without a restart.
+            `None` disables watching. A SIGHUP always reloads the config.
+        """
         if transport is None:
             from waspy.transports.httptransport import HTTPTransport
             transport = HTTPTransport()
@@ -91,6 +176,7 @@ class Application:
         self.router = router
         self.on_start = []
         self.on_stop = []
+        self.on_config_reload = []
         self._client = None
         self.config = config
         self.raven = None
@@ -98,6 +184,11 @@ class Application:
         self._cors_handler = None
         self.loop = loop
         self.default_content_type = default_content_type
+        self._executors = {}
+        self.offload_encoding_threshold = offload_encoding_threshold
+        self.config_watch_interval = config_watch_interval
+        self._config_watcher = None
+        self._large_body_handlers = set()
 
     @property
     def client(self) -> Client:
@@ -108,6 +199,29 @@ class Application:
     def add_parser(self, parser: ParserABC):
         app_parsers[parser.content_type] = parser
 
+    def get_executor(self, executor: str):
+        """
+        Get the applications `'thread'` or `'process'` pool, creating it on
+        first use. Pool sizes come from `executor.thread_workers` and
+        `executor.process_workers` in the config, and pools are shut down
+        with the other on_stop hooks.
+        """
+        if executor not in self._executors:
+            try:
+                max_workers = self.config['executor'][f'{executor}_workers']
+            except (ConfigError, ValueError):
+                max_workers = None
+            if not self._executors:
+                self.on_stop.append(self._shutdown_executors)
+            self._executors[executor] = \
+                EXECUTORS[executor](max_workers=max_workers)
+        return self._executors[executor]
+
+    def _shutdown_executors(self, app):
+        for pool in self._executors.values():
+            pool.shutdown(wait=True)
+        self._executors = {}
+
     def start_shutdown(self, signum=None, frame=None):
         # loop = asyncio.get_event_loop()
         for t in self.transport:
@@ -126,9 +240,8 @@ class Application:
         self._create_logger()
 
         # add cors support if needed
-        self._cors_handler = CORSHandler.from_config(self.config)
-        if self._cors_handler:
-            self.router.add_generic_options_handler(self._cors_handler.options_handler)
+        self._set_cors_handler(CORSHandler.from_config(self.config))
+        self.config.subscribe(self._config_reloaded)
 
         # wrap handlers in middleware
         loop.run_until_complete(self._wrap_handlers())
@@ -146,12 +259,49 @@ class Application:
         # register signals, so that stopping the service works correctly
         loop.add_signal_handler(signal.SIGTERM, self.start_shutdown)
         loop.add_signal_handler(signal.SIGINT, self.start_shutdown)
+        loop.add_signal_handler(signal.SIGHUP, self.reload_config)
+        if self.config_watch_interval is not None:
+            self._config_watcher = loop.create_task(
+                self.config.watch(self.config_watch_interval))
 
         # Run all transports - they shouldn't return until shutdown
         loop.run_until_complete(asyncio.gather(*tasks))
 
         self.shutdown()
 
+    def reload_config(self, signum=None, frame=None):
+        """ Reload the config file. Config derived parts of the app are
+            rebuilt, and `on_config_reload` hooks are called """
+        try:
+            self.config.reload()
+        except Exception:
+            logger.exception('Could not reload config, keeping the current one')
+
+    def _set_cors_handler(self, cors_handler):
+        if cors_handler:
+            self.router.add_generic_options_handler(cors_handler.options_handler)
+        elif self._cors_handler is not None:
+            # cors was removed from the config
+            current = self._cors_handler.options_handler
+            if self.router.options_handler == current:
+                self.router.options_handler = None
+        # a single assignment, so a request sees either the old or new one
+        self._cors_handler = cors_handler
+
+    def _config_reloaded(self, config):
+        try:
+            cors_handler = CORSHandler.from_config(config)
+        except (ConfigError, ValueError):
+            logger.exception('Invalid cors config, keeping the current one')
+        else:
+            self._set_cors_handler(cors_handler)
+
+        for hook in self.on_config_reload:
+            if asyncio.iscoroutinefunction(hook):
+                asyncio.ensure_future(hook(self))
+            else:
+                hook(self)
+
     async def run_on_start_hooks(self):
         """
         Run all hooks in on_start. Allows for coroutines and synchronous functions.
@@ -199,8 +349,10 @@ class Application:
                 if r.log:
                     exc_info = sys.exc_info()
                     self.logger.log_exception(request, exc_info, level='warning')
-            # invoke serialization (json) to make sure it works
-            _ = response.body
+            self._negotiate_content_type(request, response)
+            if not request.in_process:
+                # invoke serialization (json) to make sure it works
+                await self._serialize(request, response)
 
         except CancelledError:
             # This error can happen if a client closes the connection
@@ -233,6 +385,47 @@ class Application:
 
         return response
 
+    def _negotiate_content_type(self, request, response):
+        """ Responses without an explicit content type get the best one
+            from the requests Accept header that there is a parser for. """
+        if response._content_type is not None:
+            return
+        if not isinstance(response.original_body, (dict, list, type(None))):
+            # bytes and strings are sent as they are, no parser touches them
+            return
+        accept = request.headers.get('accept') or \
+            request.headers.get('Accept')
+        if not accept:
+            return
+        response.content_type = negotiate_content_type(
+            accept, tuple(app_parsers), self.default_content_type)
+
+    async def _serialize(self, request, response):
+        if not isinstance(response.original_body, (dict, list)):
+            # bytes are used as they are, and strings just need encoding
+            _ = response.raw_body
+            return
+        threshold = self.offload_encoding_threshold
+        if threshold is None:
+            _ = response.raw_body
+            return
+
+        # Body sizes are only known after encoding, so the size of the last
+        # response of a handler decides where the next one gets encoded.
+        handler = request._handler
+        if handler is None:
+            # not routed to a handler, so there is nothing to learn
+            _ = response.raw_body
+            return
+        if handler in self._large_body_handlers:
+            loop = asyncio.get_event_loop()
+            raw_body = await loop.run_in_executor(
+                self.get_executor('thread'), getattr, response, 'raw_body')
+            if len(raw_body) < threshold:
+                self._large_body_handlers.discard(handler)
+        elif len(response.raw_body) >= threshold:
+            self._large_body_handlers.add(handler)
+
     def _set_ctx(self, request):
         ctx = {'correlation_id': request.correlation_id,
                'ctx_headers':
@@ -242,16 +435,49 @@ class Application:
     async def _wrap_handlers(self):
         handler_gen = self.router._get_and_wrap_routes()
 
+        # a handler added under several routes with the same
+        # options shares one chain
+        chains = {}
         try:
-            handler = next(handler_gen)
+            handler, options = next(handler_gen)
             while True:
-                wrapped = handler
-                for middleware in self.middlewares[::-1]:
-                    wrapped = await middleware(self, wrapped)
-                handler = handler_gen.send(wrapped)
+                middlewares = self._select_middlewares(handler, options)
+                key = (handler, middlewares, frozenset(options.items()))
+                wrapped = chains.get(key)
+                if wrapped is None:
+                    wrapped = handler
+                    if 'executor' in options:
+                        wrapped = executor_handler_factory(
+                            self, wrapped, options['executor'])
+                    if 'validator' in options:
+                        wrapped = validation_handler_factory(
+                            wrapped, options['validator'])
+                    for middleware in middlewares[::-1]:
+                        wrapped = await middleware(self, wrapped)
+                    chains[key] = wrapped
+                handler, options = handler_gen.send(wrapped)
         except StopIteration:
             pass
 
+    def _select_middlewares(self, handler, options):
+        include = options.get('middlewares')
+        exclude = options.get('exclude_middlewares', frozenset())
+        unknown = (include or frozenset()).union(exclude).difference(
+            self.middlewares)
+        if unknown:
+            raise ValueError(f'Route uses middlewares that are not added '
+                             f'to the application: {unknown}')
+        # the response wrapper is what makes non-Response returns work,
+        # so it is only left out for handlers that return a Response anyway
+        wants_response = options.get('returns_response')
+        if wants_response is None:
+            wants_response = returns_response(handler)
+        return tuple(m for m in self.middlewares
+                     if (m is response_wrapper_factory and not wants_response)
+                     or (m is not response_wrapper_factory
+                         and (include is None or m in include)
+                         and m not in exclude))
+
     def _create_logger(self):
         try:
             dsn = self.config['sentry']['dsn']
@@ -278,5 +504,8 @@ class Application:
         await asyncio.gather(*coros)
 
     def shutdown(self):
+        if self._config_watcher is not None:
+            self._config_watcher.cancel()
+        self.config.unsubscribe(self._config_reloaded)
         self.loop.run_until_complete(self.run_on_stop_hooks())
         self.loop.close()
@@ -5,6 +5,7 @@ import warnings
 import asyncio
 
 from .webtypes import QueryParams, Request, Methods
+from .parser import parsers
 from .ctx import request_context
 
 
@@ -25,6 +26,7 @@ class Client:
                            content_type: str='application/json',
                            context: Request=None,
                            timeout=30,
+                           accept: str=None,
                            **kwargs) -> asyncio.coroutine:
         """
         Make a request to another service. If `context` is provided, then
@@ -44,14 +46,23 @@ class Client:
             will be made
         :param timeout: Time in seconds the client will wait befor raising
             an asyncio.TimeoutError
+        :param accept: content type(s) you want the response in, such as
+            `application/msgpack`. Sent as the Accept header.
         :param kwargs: Just a place holder so transport specific options
             can be passed through
         :return:
         """
         if not isinstance(method, Methods):
             method = Methods(method.upper())
-        if content_type == 'application/json' and isinstance(body, dict):
-            body = json.dumps(body)
+        if isinstance(body, (dict, list)):
+            parser = parsers.get(content_type)
+            if parser is not None:
+                # transports that share our parsers pass the object along,
+                # skipping encoding and decoding entirely
+                if not getattr(self.transport, 'accepts_objects', False):
+                    body = parser.encode(body)
+            elif content_type == 'application/json':
+                body = json.dumps(body)
         if isinstance(query_params, dict):
             query_string = parse.urlencode(query_params)
         elif isinstance(query_params, QueryParams):
@@ -69,6 +80,8 @@ class Client:
             correlation_id = ctx['correlation_id']
 
         headers = {**headers, **ctx['ctx_headers']}
+        if accept:
+            headers['accept'] = accept
 
         exchange = headers.get('ctx-exchange-override', None)
         if exchange:
@@ -0,0 +1,114 @@
+"""
+Body compression shared by the transports.
+
+gzip and deflate are always available, br and zstd are added when the
+optional `brotli` and `zstandard` packages are installed.
+"""
+import asyncio
+import gzip
+import zlib
+from functools import lru_cache
+
+
+# Bodies at least this big are (de)compressed in the default executor
+OFFLOAD_THRESHOLD = 256 * 1024
+
+# The order encodings are picked in, when a client accepts several equally
+PREFERENCE = ('zstd', 'br', 'gzip', 'deflate')
+
+
+def _gzip_compress(data: bytes) -> bytes:
+    return gzip.compress(data, compresslevel=5)
+
+
+def _deflate_compress(data: bytes) -> bytes:
+    # http "deflate" is the zlib format
+    return zlib.compress(data, 5)
+
+
+compressors = {
+    'gzip': (_gzip_compress, gzip.decompress),
+    'deflate': (_deflate_compress, zlib.decompress),
+}
+""" encoding -> (compress, decompress) """
+
+try:
+    import brotli
+except ImportError:
+    pass
+else:
+    compressors['br'] = (lambda data: brotli.compress(data, quality=4),
+                         brotli.decompress)
+
+try:
+    import zstandard
+except ImportError:
+    pass
+else:
+    # zstandard (de)compressor objects cant be shared between threads
+    compressors['zstd'] = (
+        lambda data: zstandard.ZstdCompressor(level=3).compress(data),
+        lambda data: zstandard.ZstdDecompressor().decompressobj()
+        .decompress(data))
+
+
+def accept_encoding() -> str:
+    """ Accept-Encoding header value for everything we can decompress """
+    return ', '.join(e for e in PREFERENCE if e in compressors)
+
+
+@lru_cache(maxsize=256)
+def negotiate_encoding(accept: str):
+    """
+    Picks the encoding to compress a response with from an
+    Accept-Encoding header. Returns None if there is nothing better than
+    sending the body as is.
+    """
+    accepted = {}
+    for part in accept.split(','):
+        coding, *params = part.split(';')
+        coding = coding.strip().lower()
+        quality = 1.0
+        for param in params:
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding] = quality
+
+    best, best_quality = None, 0.0
+    for coding in PREFERENCE:
+        if coding not in compressors:
+            continue
+        quality = accepted.get(coding, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def compress(encoding: str, data: bytes) -> bytes:
+    return compressors[encoding][0](data)
+
+
+def decompress(encoding: str, data: bytes) -> bytes:
+    try:
+        decompressor = compressors[encoding.lower()][1]
+    except KeyError:
+        raise ValueError(f'Unsupported content encoding "{encoding}"')
+    return decompressor(data)
+
+
+async def compress_async(encoding: str, data: bytes) -> bytes:
+    if len(data) < OFFLOAD_THRESHOLD:
+        return compress(encoding, data)
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(None, compress, encoding, data)
+
+
+async def decompress_async(encoding: str, data: bytes) -> bytes:
+    if len(data) < OFFLOAD_THRESHOLD:
+        return decompress(encoding, data)
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(None, decompress, encoding, data)
@@ -1,9 +1,12 @@
+import asyncio
+import logging
 import os
-import yaml
 import pathlib
 
 CONFIG_LOCATION = os.getenv('WASPY_CONFIG_LOCATION')
 
+logger = logging.getLogger('waspy')
+
 
 class ConfigError(KeyError):
     """ Raised when a requested configuration can not be found """
@@ -27,6 +30,75 @@ before trying to access a configuration value.\
 """
 
 
+_MISSING = object()
+
+
+def _config_path(filepath=None) -> pathlib.Path:
+    if filepath is None:
+        if CONFIG_LOCATION is None:
+            return pathlib.Path.cwd() / 'config.yaml'
+        return pathlib.Path(CONFIG_LOCATION).absolute()
+    return pathlib.Path(filepath)
+
+
+def _coerce_env(env: str):
+    # env vars are always passed in as strings in docker world
+    # here we will try to convert them to basic types if we can
+    if env.lower() == 'true':
+        return True
+    if env.lower() == 'false':
+        return False
+    try:
+        return int(env)
+    except ValueError:
+        return env
+
+
+def _env_var_name(key: str) -> str:
+    return key.replace('.', '_').upper()
+
+
+class _Snapshot:
+    """
+    An immutable, flattened view of the configuration with the environment
+    overlay applied. Values are stored under their dotted key
+    (`section.subsection.key`).
+    """
+    __slots__ = ('values', 'sections', 'environ', '_misses')
+
+    def __init__(self, options: dict, environ: dict):
+        self.values = {}
+        self.sections = set()
+        self.environ = environ
+        self._misses = set()
+        self._flatten(options or {}, '')
+
+    def _flatten(self, options, prefix):
+        for key, value in options.items():
+            key = prefix + str(key)
+            if isinstance(value, dict):
+                self.sections.add(key)
+                self._flatten(value, key + '.')
+                continue
+            env = self.environ.get(_env_var_name(key))
+            if env is not None:
+                value = _coerce_env(env)
+            if value is not None:
+                self.values[key] = value
+
+    def get(self, key):
+        value = self.values.get(key, _MISSING)
+        if value is not _MISSING or key in self._misses:
+            return value
+        # keys that only exist as environment variables
+        env = self.environ.get(_env_var_name(key))
+        if env is None:
+            self._misses.add(key)
+            return _MISSING
+        value = self.values[key] = _coerce_env(env)
+        return value
+
+
 class Config:
     """ load configuration from envvar or config file
         You can get settings from environment variables or a config.yaml file
@@ -39,54 +111,133 @@ class Config:
             [section.subsection]
             key = value
         in a yaml file)
+        `config['section.subsection.key']` works as well.
+
+        The file and the environment are read once, into a snapshot, when
+        the config is loaded. Use `reload()` to pick up changes; it swaps
+        the snapshot for every section at once, and `subscribe()` to be
+        told about it.
     """
-    def __init__(self, _basename=None, _defaults=None):
-        self.default_options = _defaults
+    def __init__(self, _basename=None, _defaults=None, _root=None):
         self.basename = _basename
+        if _root is not None:
+            self._root = _root
+            return
+        self._root = self
+        self.default_options = _defaults
+        self._filepath = None
+        self._snapshot = None
+        self._sections = {}
+        self._subscribers = []
+        if _defaults is not None:
+            self._take_snapshot()
 
     def from_file(self, location):
-        self._load_config(filepath=location)
+        root = self._root
+        root._filepath = location
+        root._load_config(filepath=location)
+        root._take_snapshot()
         return self
 
     def load(self):
-        if self.default_options is None:
-            self._load_config()
+        root = self._root
+        if root.default_options is None:
+            root._load_config()
+        root._take_snapshot()
+
+    def reload(self):
+        """ Read the config file and environment again, and swap the
+            snapshot used by this config and all of its sections.
+            If the file cant be read the current snapshot is kept. """
+        root = self._root
+        if root._filepath is not None:
+            root._load_config(filepath=root._filepath)
+        else:
+            root._load_config()
+        root._take_snapshot()
+        for callback in tuple(root._subscribers):
+            try:
+                callback(root)
+            except Exception:
+                logger.exception('Config reload subscriber %r failed',
+                                 callback)
+        return self
+
+    def subscribe(self, callback):
+        """ Call `callback(config)` after every reload """
+        self._root._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self._root._subscribers:
+            self._root._subscribers.remove(callback)
+
+    async def watch(self, interval: float=5.0):
+        """
+        coroutine: Polls the config file modification time every
+        `interval` seconds and reloads when it changes. Runs until
+        cancelled.
+        """
+        path = _config_path(self._root._filepath)
+
+        def mtime():
+            try:
+                return path.stat().st_mtime
+            except OSError:
+                return None
+
+        last = mtime()
+        while True:
+            await asyncio.sleep(interval)
+            current = mtime()
+            if current is None or current == last:
+                continue
+            last = current
+            logger.info('Config file %s changed, reloading', path)
+            try:
+                self.reload()
+            except Exception:
+                logger.exception('Could not reload %s, keeping the current '
+                                 'config', path)
+
+    def _take_snapshot(self):
+        self._snapshot = _Snapshot(self.default_options, dict(os.environ))
 
     def _load_config(self, filepath=None):
-        if filepath is None:
-            if CONFIG_LOCATION is None:
-                filepath = pathlib.Path.cwd() / 'config.yaml'
-            else:
-                filepath = pathlib.Path(CONFIG_LOCATION).absolute()
-        else:
-            filepath = pathlib.Path(filepath)
+        filepath = _config_path(filepath)
+        import yaml  # only needed when there is a file to read
+
         with filepath.open('r') as f:
             config = yaml.safe_load(f)
             self.default_options = config
 
-    def __getitem__(self, item):
-        if self.default_options is None:
+    def _lookup(self, item):
+        snapshot = self._root._snapshot
+        if snapshot is None:
             raise ValueError(CONFIG_NOT_YET_LOADED_ERROR_MESSAGE)
-        default = self.default_options.get(item)
+        key = self._create_basename(item)
+        if key in snapshot.sections:
+            section = self._root._sections.get(key)
+            if section is None:
+                section = self._root._sections[key] = \
+                    Config(_basename=key, _root=self._root)
+            return section
+        return snapshot.get(key)
 
-        if isinstance(default, dict):
-            return Config(_basename=self._create_basename(item),
-                          _defaults=default)
-
-        env = self._get_env_var(item)
-        if env is None:
-            if default is None:
-                raise ConfigError(self._create_basename(item),
-                                  self._create_env_var_string(item))
+    def __getitem__(self, item):
+        value = self._lookup(item)
+        if value is _MISSING:
+            raise ConfigError(self._create_basename(item),
+                              self._create_env_var_string(item))
+        return value
+
+    def get(self, item, default=None):
+        value = self._lookup(item)
+        if value is _MISSING:
             return default
-        return env
+        return value
 
     def __contains__(self, item):
-        try:
-            self.__getitem__(item)
-            return True
-        except ConfigError:
-            return False
+        return self._lookup(item) is not _MISSING
 
     def _create_basename(self, item):
         if self.basename:
@@ -95,25 +246,4 @@ class Config:
             return item
 
     def _create_env_var_string(self, item):
-        if not self.basename:
-            return item.upper()
-        else:
-            return '_'.join(self._create_basename(item).split('.')).upper()
-
-    def _get_env_var(self, item):
-        envvar_string = self._create_env_var_string(item)
-        env = os.getenv(envvar_string)
-        if env is not None:
-            if isinstance(env, str):
-                # env vars are always passed in as strings in docker world
-                # here we will try to convert them to basic types if we can
-                if env.lower() == 'true':
-                    return True
-                if env.lower() == 'false':
-                    return False
-                try:
-                    env = int(env)
-                except ValueError:
-                    pass
-        return env
-
+        return _env_var_name(self._create_basename(item))
@@ -0,0 +1,146 @@
+"""
+Cookie header parsing and Set-Cookie building.
+
+`http.cookies.SimpleCookie` runs a large regex over the whole header and
+builds a Morsel per cookie. Request cookies only need name/value pairs, so
+`RequestCookies` looks single names up straight from the header string and
+only splits the whole header when it is iterated.
+"""
+import re
+from collections.abc import Mapping
+from datetime import datetime, timezone
+
+_MISSING = object()
+
+_OCTAL_ESCAPE = re.compile(r'\\(?:([0-3][0-7][0-7])|(.))')
+
+# RFC 6265 cookie-octet: ascii without controls, whitespace, DQUOTE, comma,
+# semicolon and backslash
+_COOKIE_OCTETS = re.compile(r'^[\x21\x23-\x2B\x2D-\x3A\x3C-\x5B\x5D-\x7E]*$')
+_TOKEN = re.compile(r"^[!#$%&'*+\-.^_`|~0-9A-Za-z]+$")
+
+_SAMESITE = ('Strict', 'Lax', 'None')
+
+
+def _unescape(match):
+    if match.group(1):
+        return chr(int(match.group(1), 8))
+    return match.group(2)
+
+
+def _unquote(value: str) -> str:
+    if len(value) > 1 and value[0] == '"' and value[-1] == '"':
+        value = value[1:-1]
+        if '\\' in value:
+            value = _OCTAL_ESCAPE.sub(_unescape, value)
+    return value
+
+
+def _find(header: str, name: str):
+    """ Value of the first cookie called `name` in the header """
+    target = name + '='
+    start = 0
+    while True:
+        index = header.find(target, start)
+        if index == -1:
+            return _MISSING
+        before = index - 1
+        while before >= 0 and header[before] in ' \t':
+            before -= 1
+        if before < 0 or header[before] == ';':
+            value_start = index + len(target)
+            end = header.find(';', value_start)
+            if end == -1:
+                end = len(header)
+            return _unquote(header[value_start:end].strip())
+        start = index + 1
+
+
+def parse_cookies(header: str) -> dict:
+    """ All cookies in a Cookie header. The first of duplicate names wins,
+        like it does for single name lookups """
+    result = {}
+    for pair in header.split(';'):
+        name, sep, value = pair.partition('=')
+        if not sep:
+            continue
+        name = name.strip()
+        if name and name not in result:
+            result[name] = _unquote(value.strip())
+    return result
+
+
+class RequestCookies(Mapping):
+    """ Read only mapping of the cookies in a Cookie header """
+    __slots__ = ('_header', '_found', '_parsed')
+
+    def __init__(self, header: str=None):
+        self._header = header or ''
+        self._found = {}
+        self._parsed = None
+
+    def __getitem__(self, name):
+        if self._parsed is not None:
+            return self._parsed[name]
+        value = self._found.get(name, _MISSING)
+        if value is _MISSING:
+            value = self._found[name] = _find(self._header, name)
+        if value is _MISSING:
+            raise KeyError(name)
+        return value
+
+    def _all(self) -> dict:
+        if self._parsed is None:
+            self._parsed = parse_cookies(self._header)
+        return self._parsed
+
+    def __iter__(self):
+        return iter(self._all())
+
+    def __len__(self):
+        return len(self._all())
+
+    def __repr__(self):
+        return f'RequestCookies({self._all()!r})'
+
+
+def _quote(value: str) -> str:
+    if _COOKIE_OCTETS.match(value):
+        return value
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def build_set_cookie(name: str, value: str, *, max_age: int=None,
+                     expires=None, path: str='/', domain: str=None,
+                     secure: bool=False, httponly: bool=False,
+                     samesite: str=None) -> str:
+    """
+    Build the value of a Set-Cookie header
+    :param expires: a datetime, or a unix timestamp
+    :param samesite: 'Strict', 'Lax' or 'None'
+    """
+    if not _TOKEN.match(name):
+        raise ValueError(f'Invalid cookie name {name!r}')
+    parts = [f'{name}={_quote(str(value))}']
+    if expires is not None:
+        if isinstance(expires, datetime):
+            if expires.tzinfo is None:
+                expires = expires.replace(tzinfo=timezone.utc)
+            expires = expires.timestamp()
+        from email.utils import formatdate  # slow to import, rarely needed
+        parts.append('Expires=' + formatdate(expires, usegmt=True))
+    if max_age is not None:
+        parts.append(f'Max-Age={int(max_age)}')
+    if domain:
+        parts.append(f'Domain={domain}')
+    if path:
+        parts.append(f'Path={path}')
+    if secure:
+        parts.append('Secure')
+    if httponly:
+        parts.append('HttpOnly')
+    if samesite is not None:
+        if samesite not in _SAMESITE:
+            raise ValueError(f'samesite must be one of {_SAMESITE}')
+        parts.append(f'SameSite={samesite}')
+    return '; '.join(parts)
@@ -1,3 +1,10 @@
 from contextvars import ContextVar
 
 request_context = ContextVar('request_context')
+
+
+def call_with_context(ctx, handler, request):
+    """ Runs in a pool process, where the request context has to be
+        set again before calling the handler """
+    request_context.set(ctx)
+    return handler(request)
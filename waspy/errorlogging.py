@@ -6,6 +6,20 @@ from waspy.exceptions import UnsupportedMediaType
 logger = logging.getLogger('waspy')
 
 
+def _request_data(request):
+    """ The request body for error reports. The decoded body is used if the
+        handler already decoded it, otherwise the raw body is sent as text
+        rather than parsing it again (which might be what failed). """
+    if request._body is not None:
+        return request._body
+    raw = request.original_body
+    if not raw:
+        return None
+    if isinstance(raw, bytes):
+        return raw.decode(errors='replace')
+    return raw
+
+
 class ErrorLoggingBase:
     def log_exception(self, request, exc_info, level='error'):
         try:
@@ -37,7 +51,7 @@ class SentryLogging(ErrorLoggingBase):
         data = {
             'request': {
                 'method': request.method.value,
-                'data': request.body if request.original_body else None,
+                'data': _request_data(request),
                 'query_string': request.query_string,
                 'url': '/' + request.path.replace('.', '/'),
                 'content-type': request.content_type,
@@ -1,6 +1,27 @@
 from http import HTTPStatus
 
 
+def _add_invalid_request_status():
+    # aenum is slow to import, so the status is only added when it is
+    # first needed
+    from aenum import extend_enum
+    extend_enum(HTTPStatus, 'INVALID_REQUEST', (430, 'Invalid Request',
+                                                'Request was syntactically '
+                                                'sound, but failed '
+                                                'validation rules'))
+
+
+def http_status(code: int) -> HTTPStatus:
+    """ HTTPStatus for a status code, including waspy's own 430 """
+    try:
+        return HTTPStatus(code)
+    except ValueError:
+        if code != 430:
+            raise
+    _add_invalid_request_status()
+    return HTTPStatus(code)
+
+
 class ResponseError(Exception):
     def __init__(self, message=None, status: HTTPStatus=None, *, body=None, headers=None,
                  correlation_id=None, reason=None, content_type=None, log=False):
@@ -52,3 +73,52 @@ class UnsupportedMediaType(ResponseError):
 class NotRoutableError(ResponseError):
     status = HTTPStatus.NOT_FOUND
     reason = 'No route found'
+
+
+class InvalidRequest(ResponseError):
+    def __init__(self, errors):
+        """
+        Example
+            raise InvalidRequest([{'location': 'body.name',
+                                   'message': 'is required'}])
+        """
+        super().__init__(message='Request failed validation',
+                         status=http_status(430),
+                         body={'reason': 'Request failed validation',
+                               'errors': errors})
+        self.errors = errors
+
+
+class TaskError(Exception):
+    """ Base class for exceptions that control how a worker task
+        is settled """
+
+
+class RetryTask(TaskError):
+    def __init__(self, message=None, *, delay: float=None):
+        """
+        Retry the task later. Without a delay the worker transports
+        backoff policy decides when.
+
+        Example
+            raise RetryTask("database is busy", delay=5)
+        """
+        super().__init__(message)
+        self.delay = delay
+
+
+class RejectTask(TaskError):
+    """ Reject the task without retrying it. Brokers that support it
+        will dead-letter the message. """
+
+
+class RequeueTask(TaskError):
+    """ Put the task straight back on the queue, without counting it
+        as an attempt. """
+
+
+class NackMePleaseError(Exception):
+    """ Raise from a handler to nack (and requeue) the message.
+        Deprecated: use a `waspy.worker.Worker` with a
+        `RabbitMQWorkerTransport`, which has real ack/nack/retry semantics.
+    """
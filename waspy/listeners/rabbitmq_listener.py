@@ -1,10 +1,15 @@
+import asyncio
 import json
+import logging
+from typing import List
 
 import aioamqp
 
 from waspy.listeners.transport_listener_abc import TransportListenerABC
 from waspy.transports.rabbitmqtransport import RabbitMQTransport
 
+logger = logging.getLogger('waspy')
+
 
 class RabbitMQTransportListener(TransportListenerABC):
     queue = ''
@@ -27,6 +32,12 @@ class RabbitMQTransportListener(TransportListenerABC):
 
     json_payload = True
 
+    # When batch_size is above 1, messages are collected and handed to
+    # `handle_batch` once batch_size are waiting or batch_timeout seconds
+    # have passed since the first one arrived.
+    batch_size = 1
+    batch_timeout = 1.0
+
     def __init__(self, ):
         self.transport = None
         self.channel: aioamqp.channel.Channel = None
@@ -34,8 +45,14 @@ class RabbitMQTransportListener(TransportListenerABC):
         self._consumer_tag = None
         self._bootstrapped = False
 
+        self._batch = []
+        self._batch_timer = None
+        self._batch_lock = None
+
     async def set_channel(self, channel):
         self._bootstrapped = False
+        # unacked messages of the old channel get redelivered by rabbit
+        self._reset_batch()
         if self.channel and self.channel.is_open:
             await self.transport.close_channel(self.channel)
         self.channel = channel
@@ -61,9 +78,28 @@ class RabbitMQTransportListener(TransportListenerABC):
         )
         self._consumer_tag = resp.get('consumer_tag')
 
+    async def handle_batch(self, data: List, *, envelopes: List,
+                           properties: List) -> None:
+        """ Override this method to handle messages in batch mode.
+            The batch is acked (or nacked) as a whole once it returns. """
+        raise NotImplementedError
+
     async def _handle_work(self, _, body, envelope, properties):
         if self.json_payload:
-            body = json.loads(body)
+            try:
+                body = json.loads(body)
+            except ValueError:
+                if self.batch_size > 1 and self.use_acks:
+                    # the next batch is acked with multiple=True, which
+                    # would cover this message without it being handled.
+                    # It can never be decoded, so it is not requeued but
+                    # dead lettered (or dropped) regardless of nack_on_error
+                    await self.channel.basic_client_nack(
+                        envelope.delivery_tag, requeue=False)
+                raise
+        if self.batch_size > 1:
+            await self._add_to_batch(body, envelope, properties)
+            return
         try:
             await self.handle_work(body, evelope=envelope, properties=properties)
         except Exception as e:
@@ -74,6 +110,55 @@ class RabbitMQTransportListener(TransportListenerABC):
             if self.use_acks:
                 await self.channel.basic_client_ack(envelope.delivery_tag)
 
+    async def _add_to_batch(self, body, envelope, properties):
+        self._batch.append((body, envelope, properties))
+        if len(self._batch) >= self.batch_size:
+            await self._flush_batch()
+        elif self._batch_timer is None:
+            self._batch_timer = asyncio.get_event_loop().call_later(
+                self.batch_timeout,
+                lambda: asyncio.ensure_future(self._flush_timed_out_batch()))
+
+    def _reset_batch(self):
+        if self._batch_timer is not None:
+            self._batch_timer.cancel()
+            self._batch_timer = None
+        batch, self._batch = self._batch, []
+        return batch
+
+    async def _flush_timed_out_batch(self):
+        # nothing awaits a flush started by the timer
+        try:
+            await self._flush_batch()
+        except Exception:
+            logger.exception('Handling a batch from queue %r failed',
+                             self.queue)
+
+    async def _flush_batch(self):
+        if self._batch_lock is None:
+            self._batch_lock = asyncio.Lock()
+        # Batches have to finish in order, because acking with
+        # `multiple=True` also covers every earlier delivery on the channel.
+        async with self._batch_lock:
+            batch = self._reset_batch()
+            if not batch:
+                return
+            bodies, envelopes, properties = (list(x) for x in zip(*batch))
+            delivery_tag = envelopes[-1].delivery_tag
+            try:
+                await self.handle_batch(bodies, envelopes=envelopes,
+                                        properties=properties)
+            except Exception as e:
+                if self.nack_on_error and self.use_acks:
+                    await self.channel.basic_client_nack(
+                        delivery_tag, multiple=True,
+                        requeue=self.requeue_nacks)
+                raise e
+            else:
+                if self.use_acks:
+                    await self.channel.basic_client_ack(delivery_tag,
+                                                        multiple=True)
+
     async def exchange_declare(self):
         """ Override this method to change how a exchange is declared """
         await self.channel.exchange_declare(
@@ -97,7 +182,9 @@ class RabbitMQTransportListener(TransportListenerABC):
         if self._bootstrapped:
             return
         self._bootstrapped = True
-        await self.channel.basic_qos(prefetch_count=self.prefetch_count)
+        # a batch can only fill up if rabbit lets enough messages through
+        await self.channel.basic_qos(
+            prefetch_count=max(self.prefetch_count, self.batch_size))
         if self.declare_queue:
             await self.queue_declare()
         if self.exchange:
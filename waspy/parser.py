@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from functools import lru_cache
 import json
 
 from waspy.exceptions import ParseError
@@ -36,4 +37,103 @@ class JSONParser(ParserABC):
                 raise ParseError("Invalid JSON")
 
 
+class MsgpackParser(ParserABC):
+    """ Compact binary codec for service to service calls.
+        Requires the `msgpack` package. """
+    content_type = 'application/msgpack'
+
+    def __init__(self):
+        try:
+            import msgpack
+        except ImportError as e:
+            raise ImportWarning(
+                'You must install msgpack in order to use the msgpack parser'
+            ) from e
+        self._msgpack = msgpack
+
+    def encode(self, data) -> bytes:
+        return self._msgpack.packb(data, use_bin_type=True)
+
+    def decode(self, data: bytes):
+        if data:
+            try:
+                return self._msgpack.unpackb(data, raw=False)
+            except (ValueError, self._msgpack.UnpackException):
+                raise ParseError("Invalid msgpack")
+
+
+class CBORParser(ParserABC):
+    """ Binary codec (RFC 7049). Requires the `cbor2` package. """
+    content_type = 'application/cbor'
+
+    def __init__(self):
+        try:
+            import cbor2
+        except ImportError as e:
+            raise ImportWarning(
+                'You must install cbor2 in order to use the cbor parser'
+            ) from e
+        self._cbor2 = cbor2
+
+    def encode(self, data) -> bytes:
+        return self._cbor2.dumps(data)
+
+    def decode(self, data: bytes):
+        if data:
+            try:
+                return self._cbor2.loads(data)
+            except (ValueError, self._cbor2.CBORDecodeError):
+                raise ParseError("Invalid CBOR")
+
+
 parsers = {}
+
+
+def _parse_accept(accept):
+    """ Media ranges of an Accept header, best first. q=0 ranges are
+        dropped. """
+    ranges = []
+    for position, part in enumerate(accept.split(',')):
+        media_range, *params = part.split(';')
+        media_range = media_range.strip().lower()
+        if not media_range:
+            continue
+        quality = 1.0
+        for param in params:
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality <= 0:
+            continue
+        # more specific ranges win over wildcards of the same quality
+        specificity = 2 - media_range.count('*')
+        ranges.append((-quality, -specificity, position, media_range))
+    return [media_range for *_, media_range in sorted(ranges)]
+
+
+@lru_cache(maxsize=256)
+def negotiate_content_type(accept: str, available: tuple, default: str):
+    """
+    Picks the content type for a response from an Accept header.
+
+    :param accept: the Accept header of the request
+    :param available: content types there are parsers for
+    :param default: used for wildcards, and when nothing else is acceptable
+    :return: a content type from `available`, or the default
+    """
+    for media_range in _parse_accept(accept):
+        if media_range == '*/*':
+            return default
+        if media_range.endswith('/*'):
+            prefix = media_range[:-1]
+            if default.startswith(prefix):
+                return default
+            for content_type in available:
+                if content_type.startswith(prefix):
+                    return content_type
+        elif media_range in available:
+            return media_range
+    return default
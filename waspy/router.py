@@ -1,10 +1,12 @@
+import asyncio
 import warnings
 from contextlib import contextmanager
 from http import HTTPStatus
-from typing import Callable, Union
+from typing import Callable, Union, Iterable
 from enum import Enum
 
 from .exceptions import ResponseError
+from .validation import RequestValidator
 
 """
 The below constant is special key in the router dictionary that determines an
@@ -17,6 +19,9 @@ p.s. '_id' is to make the dictionary slightly more readable when debugging
 """
 ID_KEY = '/_id/'
 
+# The pools a handler can be run in, see `Router.add_route`
+EXECUTOR_TYPES = ('thread', 'process')
+
 
 class NotAValidURLError(Exception):
     """ When a url path syntax is not valid """
@@ -46,7 +51,7 @@ class Router:
         self._routes = {}
         """
         Routes looks like:
-        {path_section1: {path_section2: {method: (handler, params)}}}
+        {path_section1: {path_section2: {method: (handler, params, options)}}}
                 before startup and
         {path_section1: {papath_section2 {method: (wrapped, handler, params)}}
                 after startup
@@ -75,8 +80,8 @@ class Router:
             if isinstance(value, dict):
                 yield from self._get_and_wrap_routes(_d=value)
             else:
-                handler, params = value
-                wrapped = yield handler
+                handler, params, options = value
+                wrapped = yield handler, options
                 _d[key] = (wrapped, handler, params)
 
     def get_handler_for_request(self, request):
@@ -89,10 +94,13 @@ class Router:
             return self.options_handler
 
         try:
-            return self._static_routes[route][method]
+            handler = self._static_routes[route][method]
         except KeyError:
             # not in static routes
             pass
+        else:
+            request._handler = handler
+            return handler
 
         d = self._routes
         params = []
@@ -150,9 +158,54 @@ class Router:
             self._static_routes[route] = {}
         self._static_routes[route][method] = handler
 
-    def add_route(self, method: Union[str, Methods], route: str, handler: Callable):
+    def add_route(self, method: Union[str, Methods], route: str, handler: Callable,
+                  *, executor: str=None, middlewares: Iterable[Callable]=None,
+                  exclude_middlewares: Iterable[Callable]=None,
+                  returns_response: bool=None, body_schema: dict=None,
+                  query_schema: dict=None, path_schema: dict=None):
+        """
+        Adds a route.
+
+        :param executor: `'thread'` or `'process'` to run a synchronous
+            (non-coroutine) handler in the applications thread or process
+            pool, so cpu heavy handlers dont block the event loop. Process
+            pool handlers must be picklable (module level) functions.
+        :param middlewares: only wrap the handler in these of the
+            applications middleware factories. Defaults to all of them.
+        :param exclude_middlewares: middleware factories to skip for
+            this route.
+        :param returns_response: whether the handler always returns a
+            `Response`, in which case it is not wrapped to convert dicts,
+            tuples, etc. Defaults to checking the handlers return
+            annotation.
+        :param body_schema: schema the decoded body must match
+            (see `waspy.validation`). Invalid requests get a 430 before the
+            handler is called.
+        :param query_schema: schema for the query parameters, such as
+            `{'properties': {'page': {'type': 'integer'}}}`
+        :param path_schema: schema for the path parameters
+        """
         if isinstance(method, str):
             method = Methods(method.upper())
+        options = {}
+        if middlewares is not None:
+            options['middlewares'] = frozenset(middlewares)
+        if exclude_middlewares:
+            options['exclude_middlewares'] = frozenset(exclude_middlewares)
+        if returns_response is not None:
+            options['returns_response'] = returns_response
+        if body_schema is not None or query_schema is not None \
+                or path_schema is not None:
+            options['validator'] = RequestValidator(
+                body=body_schema, query=query_schema, path=path_schema)
+        if executor is not None:
+            if executor not in EXECUTOR_TYPES:
+                raise ValueError(f'Unknown executor "{executor}". '
+                                 f'Use one of {EXECUTOR_TYPES}')
+            if asyncio.iscoroutinefunction(handler):
+                raise ValueError('Only synchronous handlers can be run '
+                                 'in an executor')
+            options['executor'] = executor
 
         route = self._prefix + route
         route = route.strip('/')
@@ -178,28 +231,28 @@ class Router:
             d = d[key]
         if method in d:
             raise ValueError(f"Duplicate route exists {method}")
-        d[method] = handler, params
+        d[method] = handler, params, options
 
-    def get(self, route: str, handler: Callable):
-        self.add_route(Methods.GET, route, handler)
+    def get(self, route: str, handler: Callable, **options):
+        self.add_route(Methods.GET, route, handler, **options)
 
-    def post(self, route: str, handler: Callable):
-        self.add_route(Methods.POST, route, handler)
+    def post(self, route: str, handler: Callable, **options):
+        self.add_route(Methods.POST, route, handler, **options)
 
-    def put(self, route: str, handler: Callable):
-        self.add_route(Methods.PUT, route, handler)
+    def put(self, route: str, handler: Callable, **options):
+        self.add_route(Methods.PUT, route, handler, **options)
 
-    def patch(self, route: str, handler: Callable):
-        self.add_route(Methods.PATCH, route, handler)
+    def patch(self, route: str, handler: Callable, **options):
+        self.add_route(Methods.PATCH, route, handler, **options)
 
-    def delete(self, route: str, handler: Callable):
-        self.add_route(Methods.DELETE, route, handler)
+    def delete(self, route: str, handler: Callable, **options):
+        self.add_route(Methods.DELETE, route, handler, **options)
 
-    def head(self, route: str, handler: Callable):
-        self.add_route(Methods.HEAD, route, handler)
+    def head(self, route: str, handler: Callable, **options):
+        self.add_route(Methods.HEAD, route, handler, **options)
 
-    def options(self, route: str, handler: Callable):
-        self.add_route(Methods.OPTIONS, route, handler)
+    def options(self, route: str, handler: Callable, **options):
+        self.add_route(Methods.OPTIONS, route, handler, **options)
 
     def add_get(self, route: str, handler: Callable):
         warnings.warn("add_get is deprecated, use get instead", DeprecationWarning)
@@ -1,6 +1,39 @@
-from .httptransport import HTTPTransport as HTTPToolsTransport
-from .httptransport import HTTPTransport, HTTPClientTransport
-from .rabbitmqtransport import RabbitMQTransport, RabbitMQClientTransport
-from .transportabc import TransportABC
-from .testtransport import TestTransport
+# Transports are imported on first use (PEP 562), so HTTP only services
+# never import aioamqp.
+import importlib
 
+from .transportabc import TransportABC, ClientTransportABC, \
+    WorkerTransportABC
+
+_LAZY = {
+    'HTTPToolsTransport': ('.httptransport', 'HTTPTransport'),
+    'HTTPTransport': ('.httptransport', 'HTTPTransport'),
+    'HTTPClientTransport': ('.httptransport', 'HTTPClientTransport'),
+    'RabbitMQTransport': ('.rabbitmqtransport', 'RabbitMQTransport'),
+    'RabbitMQClientTransport': ('.rabbitmqtransport',
+                                'RabbitMQClientTransport'),
+    'RabbitMQWorkerTransport': ('.rabbitmqtransport',
+                                'RabbitMQWorkerTransport'),
+    'TestTransport': ('.testtransport', 'TestTransport'),
+    'LoopbackTransport': ('.loopbacktransport', 'LoopbackTransport'),
+    'LoopbackClientTransport': ('.loopbacktransport',
+                                'LoopbackClientTransport'),
+}
+
+__all__ = ('TransportABC', 'ClientTransportABC', 'WorkerTransportABC') + \
+    tuple(_LAZY)
+
+
+def __getattr__(name):
+    try:
+        module, attribute = _LAZY[name]
+    except KeyError:
+        raise AttributeError(
+            f'module {__name__!r} has no attribute {name!r}') from None
+    value = getattr(importlib.import_module(module, __name__), attribute)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
@@ -1,13 +1,19 @@
 import asyncio
+import json
+import os
+import socket
+import stat
 import traceback
 import logging
 import urllib.parse
-from http import HTTPStatus
 
 from httptools import HttpRequestParser, HttpResponseParser, HttpParserError, \
         parse_url
 
 from ..webtypes import Request, Response
+from ..exceptions import http_status
+from ..compression import accept_encoding, negotiate_encoding, \
+    compress_async, decompress_async
 from .transportabc import TransportABC, ClientTransportABC
 
 logger = logging.getLogger('waspy')
@@ -17,6 +23,10 @@ class ClosedError(Exception):
     """ Error for closed connections """
 
 
+class _RequestRejected(HttpParserError):
+    """ Stops parsing a request that has already been answered """
+
+
 class _HTTPClientConnection:
     slots = ('reader', 'writer', 'http_parser', '_done', '_data')
 
@@ -70,11 +80,14 @@ class _HTTPClientConnection:
             self.response.correlation_id = value
         elif name.lower() == 'content-type':
             self.response.content_type = value
+        elif name.lower() == 'set-cookie':
+            self.response.cookies.append(value)
         else:
             self.response.headers[name] = value
 
     def on_headers_complete(self):
-        self.response.status = HTTPStatus(self.http_parser.get_status_code())
+        self.response.status = http_status(
+            self.http_parser.get_status_code())
 
     def on_body(self, body):
         self._data += body
@@ -132,6 +145,8 @@ class HTTPClientTransport(ClientTransportABC):
         if body:
             headers['Content-Length'] = str(len(body))
         headers['User-Agent'] = headers.pop('user-agent', 'waspy-http-client')
+        if 'accept-encoding' not in headers and 'Accept-Encoding' not in headers:
+            headers['Accept-Encoding'] = accept_encoding()
 
         # now make a connection and send it
         connection = _HTTPClientConnection()
@@ -141,6 +156,11 @@ class HTTPClientTransport(ClientTransportABC):
             result = await connection.get_response()
         finally:
             connection.close()
+        for header in ('Content-Encoding', 'content-encoding'):
+            encoding = result.headers.pop(header, None)
+            if encoding and result.raw_body:
+                result.body = await decompress_async(encoding,
+                                                     result.raw_body)
         return result
 
 
@@ -154,18 +174,55 @@ class HTTPTransport(TransportABC):
                  port=8080,
                  prefix=None,
                  shutdown_grace_period=5,
-                 shutdown_wait_period=1):
+                 shutdown_wait_period=1,
+                 compression_threshold=1024,
+                 *,
+                 unix_socket: str=None,
+                 fd: int=None,
+                 backlog: int=100,
+                 reuse_port: bool=False,
+                 tcp_nodelay: bool=True,
+                 max_header_size: int=65536,
+                 max_body_size: int=None,
+                 header_timeout: float=10,
+                 body_timeout: float=60):
         """
          HTTP Transport for listening on http
          :param port: The port to lisen on (0.0.0.0 will always be used)
          :param prefix: the path prefix to remove from all url's
-         :param shutdown_grace_period: Time to wait for server to shutdown
-         before connections get forceably closed. The only way for connections
-         to not be forcibly closed is to have some connection draining in front
-         of the service for deploys. Most docker schedulers will do this for you.
+         :param shutdown_grace_period: Time to wait for requests in flight
+         to finish before their connections get forceably closed. Idle
+         connections are closed as soon as shutdown starts. The only way for
+         connections to not be forcibly closed is to have some connection
+         draining in front of the service for deploys. Most docker schedulers
+         will do this for you.
          :param shutdown_wait_period: Time to wait after recieving the sigterm
          before starting shutdown 
+         :param compression_threshold: Response bodies of at least this many
+         bytes are compressed, if the client accepts it. None disables
+         compression.
+         :param unix_socket: path of a unix domain socket to listen on instead
+         of the port, such as for a sidecar proxy on the same host
+         :param fd: file descriptor of an already bound and listening socket
+         to use instead of the port, for sockets passed in by systemd (the
+         first one is fd 3) or a supervisor
+         :param backlog: how many connections can wait to be accepted
+         :param reuse_port: set SO_REUSEPORT, so several processes can
+         listen on the same port
+         :param tcp_nodelay: disable Nagle's algorithm on tcp connections
+         :param max_header_size: requests with a request line and headers
+         of more than this many bytes are answered with a 431
+         :param max_body_size: requests with a body of more than this many
+         bytes are answered with a 413, before the body is read when it has
+         a Content-Length
+         :param header_timeout: seconds a connection has to send the request
+         line and headers, before it is answered with a 408
+         :param body_timeout: seconds a request has to send its body after
+         the headers, before it is answered with a 408
+         Pass None to disable any of the limits.
          """
+        if unix_socket is not None and fd is not None:
+            raise ValueError('Use either unix_socket or fd, not both')
         self.port = port
         if prefix is None:
             prefix = ''
@@ -175,10 +232,21 @@ class HTTPTransport(TransportABC):
         self._loop = None
         self._done_future = asyncio.Future()
         self._connections = set()
+        self._drained = None
         self.shutdown_grace_period = shutdown_grace_period
         self.shutdown_wait_period = shutdown_wait_period
         self.shutting_down = False
         self._config = {}
+        self.compression_threshold = compression_threshold
+        self.unix_socket = unix_socket
+        self.fd = fd
+        self.backlog = backlog
+        self.reuse_port = reuse_port
+        self.tcp_nodelay = tcp_nodelay
+        self.max_header_size = max_header_size
+        self.max_body_size = max_body_size
+        self.header_timeout = header_timeout
+        self.body_timeout = body_timeout
 
     def listen(self, *, loop: asyncio.AbstractEventLoop, config):
         self._loop = loop
@@ -190,12 +258,8 @@ class HTTPTransport(TransportABC):
 
     async def start(self, request_handler):
         self._handler = request_handler
-        self._server = await self._loop.create_server(
-            lambda: _HTTPServerProtocol(parent=self, loop=self._loop),
-            host='0.0.0.0',
-            port=self.port,
-            reuse_address=True)
-        print(f'-- Listening for HTTP on port {self.port} --')
+        self._server = await self._create_server(
+            lambda: _HTTPServerProtocol(parent=self, loop=self._loop))
         try:
             await self._done_future
         except asyncio.CancelledError:
@@ -203,30 +267,103 @@ class HTTPTransport(TransportABC):
 
         logger.warning("Shutting down HTTP transport")
         await asyncio.sleep(self.shutdown_wait_period)
-        # wait for connections to stop
-        times_no_connections = 0
-        for _ in range(self.shutdown_grace_period):
-            if not self._connections:
-                times_no_connections += 1
-            else:
-                times_no_connections = 0
-                for con in self._connections:
-                    con.attempt_close()
-
-            if times_no_connections > 3:
-                # three seconds with no connections
-                break
-            await asyncio.sleep(1)
-
-        # Shut the server down
+        # stop accepting, then let the requests in flight finish
         self._server.close()
+        await self._drain()
         await self._server.wait_closed()
+        if self.unix_socket is not None:
+            self._remove_stale_socket(self.unix_socket)
+
+    async def _drain(self):
+        """
+        Close idle connections right away and wait up to the grace period
+        for the rest. Connections still open after that are aborted.
+        :return: counts of drained, idle_closed and aborted connections
+        """
+        self._drained = self._loop.create_future()
+        idle = {con for con in self._connections if con.close_if_idle()}
+        busy = len(self._connections) - len(idle)
+        if self._connections:
+            try:
+                await asyncio.wait_for(asyncio.shield(self._drained),
+                                       self.shutdown_grace_period)
+            except asyncio.TimeoutError:
+                pass
+        remaining = self._connections - idle
+        for con in remaining:
+            con.abort()
+        counts = {'drained': busy - len(remaining),
+                  'idle_closed': len(idle),
+                  'aborted': len(remaining)}
+        logger.warning('HTTP connections drained: %(drained)d, '
+                       'closed idle: %(idle_closed)d, aborted: %(aborted)d',
+                       counts)
+        return counts
+
+    def _connection_lost(self, connection):
+        self._connections.discard(connection)
+        if (not self._connections and self._drained is not None
+                and not self._drained.done()):
+            self._drained.set_result(None)
+
+    async def _create_server(self, protocol_factory):
+        if self.unix_socket is not None:
+            self._remove_stale_socket(self.unix_socket)
+            server = await self._loop.create_unix_server(
+                protocol_factory, path=self.unix_socket, backlog=self.backlog)
+            print(f'-- Listening for HTTP on {self.unix_socket} --')
+            return server
+        if self.fd is not None:
+            sock = socket.socket(fileno=self.fd)
+            sock.setblocking(False)
+            server = await self._loop.create_server(
+                protocol_factory, sock=sock, backlog=self.backlog)
+            print(f'-- Listening for HTTP on fd {self.fd} --')
+            return server
+        server = await self._loop.create_server(
+            protocol_factory,
+            host='0.0.0.0',
+            port=self.port,
+            reuse_address=True,
+            reuse_port=self.reuse_port or None,
+            backlog=self.backlog)
+        print(f'-- Listening for HTTP on port {self.port} --')
+        return server
+
+    @staticmethod
+    def _remove_stale_socket(path):
+        """ A socket file left behind by a previous run would make
+            binding fail """
+        try:
+            if stat.S_ISSOCK(os.stat(path).st_mode):
+                os.unlink(path)
+        except FileNotFoundError:
+            pass
 
     async def handle_incoming_request(self, request):
         logger.debug('received incoming request via http: %s', request)
         response = await self._handler(request)
+        if response is not None and self.compression_threshold is not None:
+            await self._compress_response(request, response)
         return response
 
+    async def _compress_response(self, request, response):
+        accept = request.headers.get('accept-encoding')
+        if not accept or response.status.value == 204:
+            return
+        raw_body = response.raw_body
+        if not raw_body or len(raw_body) < self.compression_threshold:
+            return
+        if ('Content-Encoding' in response.headers
+                or 'content-encoding' in response.headers):
+            return
+        encoding = negotiate_encoding(accept)
+        if encoding is None:
+            return
+        response.body = await compress_async(encoding, raw_body)
+        response.headers['Content-Encoding'] = encoding
+        response.headers['Vary'] = 'Accept-Encoding'
+
     def shutdown(self):
         self.shutting_down = True
         self._done_future.cancel()
@@ -237,7 +374,8 @@ class _HTTPServerProtocol(asyncio.Protocol):
         Should only be used by HTTPServerTransport
     """
     __slots__ = ('_parent', '_transport', '_task', 'data', 'http_parser',
-                 'request')
+                 'request', '_url', '_loop', '_timeout', '_header_size',
+                 '_header_tail', '_reading_headers', '_rejected')
 
     def __init__(self, *, parent, loop):
         self._parent = parent
@@ -245,25 +383,58 @@ class _HTTPServerProtocol(asyncio.Protocol):
         self.data = None
         self.http_parser = HttpRequestParser(self)
         self.request = None
+        self._url = b''
         self._loop = loop
         self._task: asyncio.Task = None
+        self._timeout = None
+        self._header_size = 0
+        self._header_tail = b''
+        self._reading_headers = True
+        self._rejected = False
 
     """ The next 3 methods are for asyncio.Protocol handling """
 
     def connection_made(self, transport):
         self._transport = transport
         self._parent._connections.add(self)
+        sock = transport.get_extra_info('socket')
+        if sock is not None and sock.family in (socket.AF_INET,
+                                                socket.AF_INET6):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY,
+                            int(self._parent.tcp_nodelay))
+        self._set_timeout(self._parent.header_timeout)
 
     def connection_lost(self, exc):
-        self._parent._connections.discard(self)
+        self._parent._connection_lost(self)
+        self._cancel_timeout()
         if self._task:
             self._task.cancel()
         self._transport = None
 
     def data_received(self, data):
+        if self._rejected:
+            return
+        if self._reading_headers:
+            # httptools holds on to incomplete headers, so they are limited
+            # before they get to it
+            max_size = self._parent.max_header_size
+            if max_size is not None and \
+                    self._header_size + len(data) > max_size:
+                # the end of the headers can be split over two reads
+                tail = self._header_tail
+                end = (tail + data).find(b'\r\n\r\n')
+                if end == -1 or self._header_size + end - len(tail) > \
+                        max_size:
+                    self._reject(431, 'Request headers too large')
+                    return
+            self._header_size += len(data)
+            self._header_tail = data[-3:]
         try:
             self.http_parser.feed_data(data)
         except HttpParserError as e:
+            if self._rejected:
+                # a limit was hit while parsing
+                return
             traceback.print_exc()
             logger.error('Bad http: %s', self.request)
             if self._transport:
@@ -273,7 +444,34 @@ class _HTTPServerProtocol(asyncio.Protocol):
                         body={
                             'reason': 'Invalid HTTP',
                             'details': str(e)
-                        }))
+                        },
+                        content_type='application/json'))
+
+    """ Limits and timeouts """
+
+    def _set_timeout(self, seconds):
+        self._cancel_timeout()
+        if seconds is not None:
+            self._timeout = self._loop.call_later(seconds, self._timed_out)
+
+    def _cancel_timeout(self):
+        if self._timeout is not None:
+            self._timeout.cancel()
+            self._timeout = None
+
+    def _timed_out(self):
+        self._timeout = None
+        self._reject(408, 'Request timeout')
+
+    def _reject(self, status, reason):
+        """ Answer before the request is complete, and stop reading it """
+        self._rejected = True
+        self._cancel_timeout()
+        if self._transport:
+            # encoded here, the app might not have a json parser
+            self.send_response(
+                Response(status=status, body=json.dumps({'reason': reason}),
+                         content_type='application/json'))
 
     """ 
     The following methods are for HTTP parsing (from httptools)
@@ -282,6 +480,7 @@ class _HTTPServerProtocol(asyncio.Protocol):
     def on_message_begin(self):
         self.request = Request()
         self.data = b''
+        self._url = b''
 
     def on_header(self, name, value):
         key = name.decode('latin-1').lower()
@@ -296,12 +495,30 @@ class _HTTPServerProtocol(asyncio.Protocol):
             self.request.content_type = val
 
     def on_headers_complete(self):
+        self._reading_headers = False
         self.request.method = self.http_parser.get_method().decode('latin-1')
+        self._parse_url(self._url)
+        headers = self.request.headers
+        max_size = self._parent.max_body_size
+        if max_size is not None and \
+                int(headers.get('content-length', 0)) > max_size:
+            self._reject(413, 'Request body too large')
+            raise _RequestRejected()
+        if 'content-length' in headers or 'transfer-encoding' in headers:
+            self._set_timeout(self._parent.body_timeout)
+        else:
+            self._cancel_timeout()
 
     def on_body(self, body: bytes):
         self.data += body
+        max_size = self._parent.max_body_size
+        if max_size is not None and len(self.data) > max_size:
+            # chunked bodies have no length up front
+            self._reject(413, 'Request body too large')
+            raise _RequestRejected()
 
     def on_message_complete(self):
+        self._cancel_timeout()
         self.request.body = self.data
         task = self._loop.create_task(
             self._parent.handle_incoming_request(self.request))
@@ -309,6 +526,10 @@ class _HTTPServerProtocol(asyncio.Protocol):
         self._task = task
 
     def on_url(self, url):
+        # the url can arrive in pieces when it is split over several reads
+        self._url += url
+
+    def _parse_url(self, url):
         url = url.replace(b'//', b'/')
         url = parse_url(url)
         if url.query:
@@ -369,6 +590,8 @@ class _HTTPServerProtocol(asyncio.Protocol):
                 continue
             headers += '{header}: {value}\r\n'.format(
                 header=header, value=value)
+        for cookie in response.cookies:
+            headers += 'Set-Cookie: {}\r\n'.format(cookie)
 
         result = headers.encode('latin-1') + b'\r\n'
         if response.raw_body and content_length > 0:
@@ -387,3 +610,14 @@ class _HTTPServerProtocol(asyncio.Protocol):
     def attempt_close(self):
         if self.request == 0 and self._transport:
             self._transport.close()
+
+    def close_if_idle(self):
+        """ Close the connection if no request has started on it yet """
+        if self.request is None and self._transport:
+            self._transport.close()
+            return True
+        return False
+
+    def abort(self):
+        if self._transport:
+            self._transport.abort()
@@ -0,0 +1,88 @@
+"""
+In process transports, for apps that run in the same process (co-hosted
+services, or integration tests).
+
+A `LoopbackTransport` registers its app under a service name, and a
+`LoopbackClientTransport` calls straight into `Application.handle_request`
+of the app registered under the service name it is given. Bodies with a
+registered parser are handed over as objects, and responses are not
+encoded, so nothing is serialized. Both sides see the same objects, so
+neither should change a body after handing it over.
+"""
+import asyncio
+
+from ..webtypes import Request, Response
+from .transportabc import TransportABC, ClientTransportABC
+
+services = {}
+""" service name -> running LoopbackTransport """
+
+
+class LoopbackClientTransport(ClientTransportABC):
+    accepts_objects = True
+
+    async def make_request(self, service: str, method: str, path: str,
+                           body=None, query: str=None, headers: dict=None,
+                           correlation_id: str=None, content_type: str=None,
+                           timeout: int=30, **kwargs) -> Response:
+        try:
+            transport = services[service]
+        except KeyError:
+            raise ConnectionRefusedError(
+                f'No loopback service called "{service}"') from None
+
+        if not path.startswith('/'):
+            path = '/' + path
+        headers = dict(headers) if headers else {}
+        if content_type:
+            headers['content-type'] = content_type
+        request = Request(headers=headers, path=path,
+                          correlation_id=correlation_id, method=method,
+                          query_string=query or None, body=body,
+                          content_type=content_type)
+        request.in_process = True
+        # a task of its own, so the called app has its own request context
+        return await asyncio.ensure_future(transport.handle_request(request))
+
+
+class LoopbackTransport(TransportABC):
+    def __init__(self, service: str):
+        """
+        Serves an app to `LoopbackClientTransport`s in the same process
+        :param service: the service name clients use to reach this app
+        """
+        self.service = service
+        self._handler = None
+        self._done_future = None
+
+    def get_client(self):
+        return LoopbackClientTransport()
+
+    def listen(self, *, loop, config):
+        if services.get(self.service, self) is not self:
+            raise ValueError(
+                f'A loopback service called "{self.service}" already exists')
+        self._done_future = loop.create_future()
+
+    async def start(self, request_handler):
+        self._handler = request_handler
+        services[self.service] = self
+        try:
+            await self._done_future
+        except asyncio.CancelledError:
+            pass
+        finally:
+            if services.get(self.service) is self:
+                del services[self.service]
+
+    async def handle_request(self, request):
+        if self._handler is None:
+            raise ConnectionRefusedError(
+                f'Loopback service "{self.service}" is not started')
+        return await self._handler(request)
+
+    def shutdown(self):
+        if self._done_future is not None and not self._done_future.done():
+            self._done_future.cancel()
+        if services.get(self.service) is self:
+            del services[self.service]
@@ -8,26 +8,23 @@ import os
 
 import aioamqp
 import re
+from functools import lru_cache
 from aioamqp import protocol
 from aioamqp.channel import Channel
 
 
 from .transportabc import TransportABC, ClientTransportABC, WorkerTransportABC
-from ..webtypes import Request, Response, Methods
-from ..exceptions import NotRoutableError
+from ..webtypes import Request, Response, Methods, Task
+from ..compression import compressors, accept_encoding, negotiate_encoding, \
+    compress_async, decompress_async
+from ..exceptions import NotRoutableError, RetryTask, RejectTask, \
+    RequeueTask, NackMePleaseError
 from waspy.listeners.transport_listener_abc import TransportListenerABC
 
 
 logger = logging.getLogger("waspy")
 
 
-class NackMePleaseError(Exception):
-    """ This is a dirty dirty dirty dirty hack that is in place until
-        I have time to add a real worker tier type connector support in waspy
-        TODO: Please get rid of this as soon as your able to
-    """
-
-
 def parse_rabbit_message(body, envelope, properties):
     return Response()
 
@@ -142,8 +139,15 @@ class RabbitMQClientTransport(ClientTransportABC, RabbitChannelMixIn):
 
     def __init__(self, *, url=None, port=5672, virtualhost='/',
                  username='guest', password='guest',
-                 ssl=False, verify_ssl=True, heartbeat=20):
-
+                 ssl=False, verify_ssl=True, heartbeat=20,
+                 compression=None, compression_threshold=1024):
+        """
+        :param compression: encoding (such as `gzip`) to compress request
+            bodies with. Only use this if every service you call can
+            decompress it. Responses are always decompressed.
+        :param compression_threshold: bodies smaller than this many bytes
+            are sent as they are
+        """
         super().__init__()
         self._transport = None
         self._protocol = None
@@ -162,6 +166,10 @@ class RabbitMQClientTransport(ClientTransportABC, RabbitChannelMixIn):
         self.channel = None
         self.heartbeat = heartbeat
         self._connected = False
+        if compression is not None and compression not in compressors:
+            raise ValueError(f'Unsupported compression "{compression}"')
+        self.compression = compression
+        self.compression_threshold = compression_threshold
 
         if not url:
             raise TypeError("RabbitMqClientTransport() missing 1 required keyword-only argument: 'url'")
@@ -188,15 +196,7 @@ class RabbitMQClientTransport(ClientTransportABC, RabbitChannelMixIn):
         if correlation_id is None:
             correlation_id = str(uuid.uuid4())
 
-        # need to use `?` to represent `.` in rabbit
-        # since its not valid in a path, it should work correctly everywhere
-        path = path.replace('.', '?')
-
-        # now turn slashes into dots for rabbit style paths
-        path = path.replace('/', '.').lstrip('.')
-
-        if method != 'PUBLISH':
-            path = f'{method.lower()}.' + path
+        path = path_to_routing_key(method, path)
 
         if headers is None:
             headers = {}
@@ -213,19 +213,41 @@ class RabbitMQClientTransport(ClientTransportABC, RabbitChannelMixIn):
             'type': method,
             'app_id': 'test',
         }
-        if method != 'PUBLISH':
-            properties['reply_to'] = self.response_queue_name
-            properties['expiration']: str(timeout * 1000)
-
+        if self.compression and len(body) >= self.compression_threshold:
+            body = await compress_async(self.compression, body)
+            properties['content_encoding'] = self.compression
         if content_type:
             properties['content_type'] = content_type
 
+        if method == 'PUBLISH':
+            await self._publish(exchange, path, properties, body, mandatory)
+            return
+
+        properties['reply_to'] = self.response_queue_name
+        headers.setdefault('accept-encoding', accept_encoding())
+        # amqp expiration is a string of whole milliseconds
+        properties['expiration'] = str(int(timeout * 1000))
+
+        # The future has to be registered before publishing, otherwise a
+        # fast reply can arrive before there is anything to resolve.
+        future = asyncio.get_event_loop().create_future()
+        self._response_futures[message_id] = future
+        try:
+            await self._publish(exchange, path, properties, body, mandatory)
+            return await asyncio.wait_for(future, timeout=timeout)
+        finally:
+            # Covers replies, returns, timeouts, cancellation and publish
+            # failures alike, so abandoned calls never leak a future.
+            self._response_futures.pop(message_id, None)
+
+    async def _publish(self, exchange, routing_key, properties, body,
+                       mandatory):
         for i in range(3):  # retry messages on closed channels
             if i > 0:
                 logger.info(f'Publish re-attempt #{i}')
             try:
                 await self.channel.basic_publish(exchange_name=exchange,
-                                                 routing_key=path,
+                                                 routing_key=routing_key,
                                                  properties=properties,
                                                  payload=body,
                                                  mandatory=mandatory)
@@ -238,11 +260,6 @@ class RabbitMQClientTransport(ClientTransportABC, RabbitChannelMixIn):
             else:
                 break
 
-        if method != 'PUBLISH':
-            future = asyncio.Future()
-            self._response_futures[message_id] = future
-            return await future
-
     async def _bootstrap_channel(self, channel: Channel):
         if self.channel == channel:
             logger.warning("somehow the channels are the same on a bootstrap")
@@ -264,19 +281,28 @@ class RabbitMQClientTransport(ClientTransportABC, RabbitChannelMixIn):
             raise
 
     async def handle_responses(self, channel, body, envelope, properties):
-        future = self._response_futures.pop(properties.message_id)
+        future = self._response_futures.pop(properties.message_id, None)
+        if future is None:
+            # the caller already timed out or went away
+            logger.debug('Got a response for an unknown or expired request: %s',
+                         properties.message_id)
+            return
 
         headers = properties.headers
         status = headers.pop('Status')
+        cookies = headers.pop('set-cookie', ())
 
         if properties.headers.get('content-length', 1) in (0, '0'):
             body = None
+        elif properties.content_encoding:
+            body = await _decompress_body(properties.content_encoding, body)
 
         response = Response(headers=headers,
                             correlation_id=properties.correlation_id,
                             body=body,
                             status=int(status),
                             content_type=properties.content_type)
+        response.cookies.extend(cookies)
         if not future.done():
             future.set_result(response)
 
@@ -285,6 +311,8 @@ class RabbitMQClientTransport(ClientTransportABC, RabbitChannelMixIn):
         if not future:
             logger.warning('Got a returned message with nowhere to send it')
             return
+        if future.done():
+            return
         if envelope.reply_code == 312:
             # no route
             future.set_exception(NotRoutableError())
@@ -301,7 +329,15 @@ class RabbitMQTransport(TransportABC, RabbitChannelMixIn):
     def __init__(self, *, url, port=5672, queue='', virtualhost='/',
                  username='guest', password='guest',
                  ssl=False, verify_ssl=True, create_queue=True,
-                 use_acks=False, heartbeat=20):
+                 use_acks=False, heartbeat=20, compression_threshold=1024,
+                 shutdown_grace_period=30):
+        """
+        :param compression_threshold: replies of at least this many bytes
+            are compressed when the caller sent an accept-encoding header.
+            None disables compression.
+        :param shutdown_grace_period: seconds to wait on shutdown for the
+            requests in flight to finish before they are cancelled
+        """
         super().__init__()
         self.host = url
         self.port = port
@@ -319,13 +355,17 @@ class RabbitMQTransport(TransportABC, RabbitChannelMixIn):
         self._app = None
         self._loop = None
         self._consumer_tag = None
-        self._counter = 0
+        self._tasks = set()
+        self.shutdown_grace_period = shutdown_grace_period
         self._handler = None
         self._done_future = asyncio.Future()
         self._closing = False
         self._client = None
         self.heartbeat = heartbeat
+        self.compression_threshold = compression_threshold
         self._config = {}
+        self._bindings = set()
+        self._router_bindings = set()
 
         self.listeners = []
 
@@ -350,18 +390,59 @@ class RabbitMQTransport(TransportABC, RabbitChannelMixIn):
     async def declare_queue(self):
         pass
 
-    async def bind_to_exchange(self, *, exchange, routing_key):
+    async def bind_to_exchange(self, *, exchange, routing_key, no_wait=False):
         await self.channel.queue_bind(exchange_name=exchange,
                                       queue_name=self.queue,
-                                      routing_key=routing_key)
+                                      routing_key=routing_key,
+                                      no_wait=no_wait)
+        self._bindings.add((exchange, routing_key))
+
+    async def unbind_from_exchange(self, *, exchange, routing_key):
+        await self.channel.queue_unbind(exchange_name=exchange,
+                                        queue_name=self.queue,
+                                        routing_key=routing_key)
+        self._bindings.discard((exchange, routing_key))
+
+    async def register_router(self, router, exchange='amq.topic', *,
+                              owned_prefixes=()):
+        """
+        Bind the queue to every topic the router can handle.
 
-    async def register_router(self, router, exchange='amq.topic'):
+        The topic set is reduced to the minimum needed (see
+        `minimal_topic_set`) and reconciled against the bindings made by a
+        previous call, so only missing bindings are added and bindings for
+        routes that went away are removed.
+
+        :param owned_prefixes: path prefixes (such as `/foo`) this service
+            owns entirely. Topics under them collapse into one `#` binding.
+        """
         if not self.channel:
             # Something weird is going on here?
             return
 
-        for topic in (parse_url_to_topic(*url) for url in router.urls):
-            await self.bind_to_exchange(exchange=exchange, routing_key=topic)
+        topics = minimal_topic_set(
+            (parse_url_to_topic(*url) for url in router.urls),
+            owned_prefixes=owned_prefixes)
+        wanted = {(exchange, topic) for topic in topics}
+
+        stale = {b for b in self._router_bindings if b[0] == exchange} - wanted
+        for _, topic in sorted(stale):
+            await self.unbind_from_exchange(exchange=exchange, routing_key=topic)
+            self._router_bindings.discard((exchange, topic))
+
+        missing = sorted(topic for _, topic in wanted - self._bindings)
+        if missing:
+            # Methods on a channel are handled in order, so everything but
+            # the last bind can go out with no_wait. Waiting for the last
+            # bind-ok confirms the whole batch, and a failed bind closes the
+            # channel, which surfaces here.
+            await asyncio.gather(*(
+                self.bind_to_exchange(exchange=exchange, routing_key=topic,
+                                      no_wait=True)
+                for topic in missing[:-1]))
+            await self.bind_to_exchange(exchange=exchange,
+                                        routing_key=missing[-1])
+        self._router_bindings.update(wanted)
 
     async def start(self, handler):
         print(f"-- Listening for rabbitmq messages on queue {self.queue} --")
@@ -380,9 +461,28 @@ class RabbitMQTransport(TransportABC, RabbitChannelMixIn):
         # shutting down
         logger.warning("Shutting down rabbitmq transport")
         await self.channel.basic_cancel(self._consumer_tag)
+        # the replies of requests in flight still need the channel
+        await self._drain()
         await self.close()
-        while self._counter > 0:
-            await asyncio.sleep(1)
+
+    async def _drain(self):
+        """
+        Wait up to the grace period for the requests in flight, and cancel
+        the ones that are not done by then
+        :return: counts of drained and cancelled requests
+        """
+        in_flight = len(self._tasks)
+        pending = ()
+        if self._tasks:
+            _, pending = await asyncio.wait(
+                self._tasks, timeout=self.shutdown_grace_period)
+            for task in pending:
+                task.cancel()
+        counts = {'drained': in_flight - len(pending),
+                  'cancelled': len(pending)}
+        logger.warning('Rabbitmq requests drained: %(drained)d, '
+                       'cancelled: %(cancelled)d', counts)
+        return counts
 
     def listen(self, *, loop, config):
         loop.create_task(self.connect(loop=loop))
@@ -410,30 +510,22 @@ class RabbitMQTransport(TransportABC, RabbitChannelMixIn):
          at a time.
         """
         if futurize:
-            asyncio.ensure_future(
+            task = asyncio.ensure_future(
                 self.handle_request(channel, body, envelope, properties,
                                     futurize=False))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
             return
 
-        self._counter += 1
         headers = properties.headers or {}
         query = headers.pop('x-wasp-query-string', '').lstrip('?')
         correlation_id = properties.correlation_id
         message_id = properties.message_id
         reply_to = properties.reply_to
-        route = envelope.routing_key
-
-        method, path = route.split('.', 1)
-        try:
-            method = Methods(method.upper())
-        except ValueError:
-            path = route
-            method = 'POST'
-        path = path.replace('.', '/')
-        # need to use `?` to represent `.` in rabbit
-        # since its not valid in a path, it should work correctly everywhere
-        path = path.replace('?', '.')
-        path = urllib.parse.unquote(path)
+        method, path = routing_key_to_path(envelope.routing_key)
+        accept = headers.pop('accept-encoding', None)
+        if properties.content_encoding:
+            body = await _decompress_body(properties.content_encoding, body)
 
         request = Request(
             headers=headers,
@@ -446,16 +538,23 @@ class RabbitMQTransport(TransportABC, RabbitChannelMixIn):
         if properties.content_type:
             headers['content-type'] = properties.content_type
             request.content_type = properties.content_type
-        if properties.content_encoding:
-            headers['content-encoding'] = properties.content_encoding
 
         logger.debug('received incoming request via rabbitmq: %s', request)
-        response = await self._handler(request)
+        try:
+            response = await self._handler(request)
+        except NackMePleaseError:
+            if self._use_acks:
+                await channel.basic_client_nack(
+                    delivery_tag=envelope.delivery_tag)
+            return
         if response is None:
             # task got cancelled. Dont send a response.
             return
         if reply_to:
             response.headers['Status'] = str(response.status.value)
+            if response.cookies:
+                # amqp header tables can hold a list, unlike http headers
+                response.headers['set-cookie'] = response.cookies
 
             payload = response.raw_body or b'null'
 
@@ -466,6 +565,10 @@ class RabbitMQTransport(TransportABC, RabbitChannelMixIn):
                 'message_id': message_id,
                 'expiration': '30000',
             }
+            encoding = self._reply_encoding(accept, payload)
+            if encoding:
+                payload = await compress_async(encoding, payload)
+                properties['content_encoding'] = encoding
             await self._channel_ready.wait()
             await channel.basic_publish(exchange_name='',
                                         payload=payload,
@@ -474,7 +577,12 @@ class RabbitMQTransport(TransportABC, RabbitChannelMixIn):
 
         if self._use_acks:
             await self.channel.basic_client_ack(delivery_tag=envelope.delivery_tag)
-        self._counter -= 1
+
+    def _reply_encoding(self, accept, payload):
+        if (not accept or self.compression_threshold is None
+                or len(payload) < self.compression_threshold):
+            return None
+        return negotiate_encoding(accept)
 
     def shutdown(self):
         self._done_future.cancel()
@@ -497,6 +605,343 @@ class RabbitMQTransport(TransportABC, RabbitChannelMixIn):
         self.listeners.append(listener)
         listener.set_transport(self)
 
+
+class RabbitMQWorkerTransport(WorkerTransportABC, RabbitChannelMixIn):
+    ATTEMPT_HEADER = 'x-waspy-attempt'
+
+    def __init__(self, *, url, queue, port=5672, virtualhost='/',
+                 username='guest', password='guest',
+                 ssl=False, verify_ssl=True, heartbeat=20,
+                 create_queue=True, durable=True, concurrency=1,
+                 max_retries=3, retry_delay=1.0, retry_backoff=2.0,
+                 max_retry_delay=300.0, retry_on_error=True,
+                 dead_letter_exchange=None):
+        """
+        RabbitMQ transport for the worker tier.
+
+        Tasks are acked once the handler returns. When the handler raises
+        `RetryTask` (or any other exception, if `retry_on_error`) the task
+        is republished to a delay queue, which dead-letters it back onto
+        `queue` once its ttl runs out. Tasks out of retries, or that raise
+        `RejectTask`, are nacked without requeue so rabbit can send them to
+        `dead_letter_exchange`.
+
+        :param concurrency: maximum number of tasks handled at once
+        :param max_retries: retries after the first attempt
+        :param retry_delay: delay in seconds before the first retry
+        :param retry_backoff: multiplier applied to the delay on every retry
+        :param max_retry_delay: upper bound for the delay in seconds
+        :param retry_on_error: retry unexpected exceptions, instead
+            of rejecting the task
+        :param dead_letter_exchange: exchange for rejected tasks. Only used
+            when the queue is declared.
+        """
+        super().__init__()
+        self.host = url
+        self.port = port
+        self.virtualhost = virtualhost
+        self.queue = queue
+        self.username = username
+        self.password = password
+        self.ssl = ssl
+        self.verify_ssl = verify_ssl
+        self.heartbeat = heartbeat
+        self.create_queue = create_queue
+        self.durable = durable
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.retry_backoff = retry_backoff
+        self.max_retry_delay = max_retry_delay
+        self.retry_on_error = retry_on_error
+        self.dead_letter_exchange = dead_letter_exchange
+        self._transport = None
+        self._protocol = None
+        self.channel = None
+        self._consumer_tag = None
+        self._handler = None
+        self._semaphore = None
+        self._declare_lock = None
+        self._tasks = set()
+        self._delay_queues = set()
+        self._done_future = asyncio.Future()
+        self._closing = False
+        self._config = {}
+
+    def listen(self, *, loop, config):
+        loop.create_task(self.connect(loop=loop))
+        self._config = config
+
+        async def setup():
+            await self._channel_ready.wait()
+            if self.create_queue:
+                arguments = {}
+                if self.dead_letter_exchange is not None:
+                    arguments['x-dead-letter-exchange'] = \
+                        self.dead_letter_exchange
+                await self.channel.queue_declare(queue_name=self.queue,
+                                                 durable=self.durable,
+                                                 arguments=arguments)
+
+        loop.run_until_complete(setup())
+
+    async def start(self, task_handler):
+        print(f"-- Listening for tasks on queue {self.queue} --")
+        self._handler = task_handler
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._declare_lock = asyncio.Lock()
+
+        await self._channel_ready.wait()
+
+        # channel hasn't actually been bootstraped yet
+        await self._bootstrap_channel(self.channel)
+
+        try:
+            await self._done_future
+        except asyncio.CancelledError:
+            pass
+
+        logger.warning("Shutting down rabbitmq worker transport")
+        await self.channel.basic_cancel(self._consumer_tag)
+        if self._tasks:
+            await asyncio.wait(self._tasks)
+        self._closing = True
+        await self.disconnect()
+
+    def shutdown(self):
+        self._done_future.cancel()
+
+    async def _bootstrap_channel(self, channel):
+        self.channel = channel
+
+        if self._handler is None:
+            return
+
+        await self.channel.basic_qos(prefetch_count=self.concurrency)
+        resp = await self.channel.basic_consume(
+            self.handle_message,
+            queue_name=self.queue,
+        )
+        self._consumer_tag = resp.get('consumer_tag')
+
+    async def handle_message(self, channel: Channel, body, envelope,
+                             properties):
+        # Blocking here, instead of inside the task, keeps aioamqp from
+        # handing us more deliveries than we are allowed to work on.
+        await self._semaphore.acquire()
+        task = asyncio.ensure_future(
+            self._run_task(channel, body, envelope, properties))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_task(self, channel, body, envelope, properties):
+        try:
+            headers = dict(properties.headers or {})
+            attempt = int(headers.pop(self.ATTEMPT_HEADER, 1))
+            task = Task(body=body,
+                        headers=headers,
+                        correlation_id=properties.correlation_id,
+                        content_type=properties.content_type,
+                        name=envelope.routing_key,
+                        message_id=properties.message_id,
+                        attempt=attempt)
+            logger.debug('received task via rabbitmq: %s', task)
+            try:
+                await self._handler(task)
+            except RequeueTask:
+                await channel.basic_client_nack(envelope.delivery_tag,
+                                                requeue=True)
+            except RejectTask:
+                await channel.basic_client_nack(envelope.delivery_tag,
+                                                requeue=False)
+            except RetryTask as e:
+                await self._retry(channel, body, envelope, properties, task,
+                                  delay=e.delay)
+            except Exception:
+                logger.exception('Error while handling task %s', task)
+                if self.retry_on_error:
+                    await self._retry(channel, body, envelope, properties,
+                                      task)
+                else:
+                    await channel.basic_client_nack(envelope.delivery_tag,
+                                                    requeue=False)
+            else:
+                await channel.basic_client_ack(envelope.delivery_tag)
+        finally:
+            self._semaphore.release()
+
+    def retry_delay_for(self, attempt):
+        """ Seconds to wait before retrying a task that failed on `attempt` """
+        delay = self.retry_delay * self.retry_backoff ** (attempt - 1)
+        return min(delay, self.max_retry_delay)
+
+    async def _retry(self, channel, body, envelope, properties, task,
+                     delay=None):
+        if task.attempt > self.max_retries:
+            logger.error('Task %s is out of retries, rejecting it', task)
+            await channel.basic_client_nack(envelope.delivery_tag,
+                                            requeue=False)
+            return
+        if delay is None:
+            delay = self.retry_delay_for(task.attempt)
+        delay_queue = await self._declare_delay_queue(channel,
+                                                      int(delay * 1000))
+        headers = {**(properties.headers or {}),
+                   self.ATTEMPT_HEADER: task.attempt + 1}
+        retry_properties = {
+            'headers': headers,
+            'correlation_id': properties.correlation_id,
+            'message_id': properties.message_id,
+            'delivery_mode': 2,
+        }
+        if properties.content_type:
+            retry_properties['content_type'] = properties.content_type
+        await channel.basic_publish(exchange_name='',
+                                    routing_key=delay_queue,
+                                    properties=retry_properties,
+                                    payload=body)
+        await channel.basic_client_ack(envelope.delivery_tag)
+
+    async def _declare_delay_queue(self, channel, delay_ms):
+        """
+        One queue per delay, since rabbit only expires messages at the head
+        of a queue. Messages expire onto the work queue through the
+        default exchange.
+        """
+        name = f'{self.queue}.delay.{delay_ms}'
+        # concurrent declares on one channel would trip over each other
+        async with self._declare_lock:
+            if name not in self._delay_queues:
+                await channel.queue_declare(
+                    queue_name=name,
+                    durable=self.durable,
+                    arguments={
+                        'x-dead-letter-exchange': '',
+                        'x-dead-letter-routing-key': self.queue,
+                        'x-message-ttl': delay_ms,
+                    })
+                self._delay_queues.add(name)
+        return name
+
+
+async def _decompress_body(encoding, body):
+    try:
+        return await decompress_async(encoding, body)
+    except Exception:
+        # leave it to the parser to reject the body
+        logger.warning('Could not decompress %s message body', encoding,
+                       exc_info=True)
+        return body
+
+
+_TOPIC_ID_PATTERN = re.compile(r"\.\{[^\}]*\}[:\w\d_-]*")
+
+# Routing keys carry ids, so the caches are bounded rather than unlimited
+_TRANSLATION_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=_TRANSLATION_CACHE_SIZE)
+def routing_key_to_path(routing_key):
+    """
+    Transforms an incoming routing key into a `(method, path)` pair.
+
+    `get.foo.12.bar` -> `(Methods.GET, 'foo/12/bar')`
+
+    The path has no leading slash.
+
+    Routing keys that dont start with a known method are treated as a
+    `POST` to the full key.
+    """
+    method, _, path = routing_key.partition('.')
+    try:
+        method = Methods(method.upper())
+    except ValueError:
+        path = routing_key
+        method = Methods.POST
+    path = path.replace('.', '/')
+    # need to use `?` to represent `.` in rabbit
+    # since its not valid in a path, it should work correctly everywhere
+    path = path.replace('?', '.')
+    if '%' in path:
+        path = urllib.parse.unquote(path)
+    return method, path
+
+
+@lru_cache(maxsize=_TRANSLATION_CACHE_SIZE)
+def path_to_routing_key(method, path):
+    """
+    Transforms an outgoing request path into a routing key.
+
+    `('GET', '/foo/12/bar')` -> `get.foo.12.bar`
+
+    `PUBLISH` requests dont get the method prefixed.
+    """
+    # need to use `?` to represent `.` in rabbit
+    # since its not valid in a path, it should work correctly everywhere
+    path = path.replace('.', '?')
+
+    # now turn slashes into dots for rabbit style paths
+    path = path.replace('/', '.').lstrip('.')
+
+    if method != 'PUBLISH':
+        path = f'{method.lower()}.' + path
+    return path
+
+
+def _topic_covers(pattern, topic):
+    """ Whether every routing key matched by `topic` also matches `pattern`.
+        Both are lists of topic words. """
+    if not pattern:
+        return not topic
+    head = pattern[0]
+    if head == '#':
+        return any(_topic_covers(pattern[1:], topic[i:])
+                   for i in range(len(topic) + 1))
+    if not topic or topic[0] == '#':
+        return False
+    if head == '*' or head == topic[0]:
+        return _topic_covers(pattern[1:], topic[1:])
+    return False
+
+
+def minimal_topic_set(topics, owned_prefixes=()):
+    """
+    Reduces a collection of topics to the smallest set of bindings that
+    routes the same messages.
+
+    Duplicates are removed (`get.foo.{id}` and `get.foo.{id}:action` are
+    both `get.foo.*`), as are topics already covered by a wildcard topic
+    (`get.foo.bar` is covered by `get.foo.*`).
+
+    Topics under an owned prefix collapse into a single `#` topic per
+    method, so `/foo` owned turns `get.foo`, `get.foo.*` and `get.foo.*.bar`
+    into `get.foo.#`. Only do this for subtrees no other service serves.
+    """
+    owned = [path_to_routing_key('PUBLISH', prefix) for prefix in owned_prefixes]
+    collapsed = set()
+    for topic in topics:
+        method, _, rest = topic.partition('.')
+        for prefix in owned:
+            if rest == prefix or rest.startswith(prefix + '.'):
+                topic = f'{method}.{prefix}.#'
+                break
+        collapsed.add(topic)
+
+    words = {topic: topic.split('.') for topic in collapsed}
+    result = set()
+    for topic, topic_words in words.items():
+        for other, other_words in words.items():
+            if other == topic or not _topic_covers(other_words, topic_words):
+                continue
+            # keep one of two topics that cover each other
+            if not _topic_covers(topic_words, other_words) or other < topic:
+                break
+        else:
+            result.add(topic)
+    return result
+
+
+@lru_cache(maxsize=None)
 def parse_url_to_topic(method, route):
     """
     Transforms a URL to a topic.
@@ -516,4 +961,4 @@ def parse_url_to_topic(method, route):
     route = route.replace('/', '.').strip('.')
     topic = f'{method.value.lower()}.{route}'
     # need to replace `{id}` and `{id}:some_method` with just `*`
-    return re.sub(r"\.\{[^\}]*\}[:\w\d_-]*", ".*", topic)
+    return _TOPIC_ID_PATTERN.sub(".*", topic)
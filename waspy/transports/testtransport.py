@@ -1,10 +1,33 @@
 import asyncio
 import json
+import time
+from typing import Iterable, List, Tuple
 
 from .. import webtypes
+from .._cors import CORSHandler
 from .transportabc import TransportABC, ClientTransportABC
 
 
+class _MemoryTransport(asyncio.Transport):
+    """ Collects what an asyncio.Protocol writes, instead of a socket """
+    def __init__(self):
+        super().__init__()
+        self.data = bytearray()
+        self.closed = asyncio.Event()
+
+    def write(self, data):
+        self.data += data
+
+    def close(self):
+        self.closed.set()
+
+    def is_closing(self):
+        return self.closed.is_set()
+
+    def get_extra_info(self, name, default=None):
+        return default
+
+
 class TestClientTransport(ClientTransportABC):
     async def make_request(self, service: str, method: str, path: str,
                      body: bytes = None, query: str = None,
@@ -14,10 +37,19 @@ class TestClientTransport(ClientTransportABC):
 
 
 class TestTransport(TransportABC):
+    """
+    Runs an app without a network, for tests.
+
+    `run_app` and `send_request` are for synchronous tests. Async tests
+    use `start_app` inside their loop, and then `send_async_request`,
+    `send_concurrent` to drive many requests at once, or `send_http` to
+    run raw bytes through the HTTP protocol parser.
+    """
     def __init__(self, *args, **kwargs):
         self.app = None
         self.loop = None
         self.handler = None
+        self._http = None
 
     def listen(self, *, loop, config):
         self.loop = loop
@@ -36,6 +68,74 @@ class TestTransport(TransportABC):
         app.send_request = send_request_for_app
         app.send_async_request = send_async_request_for_app
 
+    async def start_app(self, app):
+        """ coroutine: Prepare `app` like `Application.run` does, in the
+            running loop, and serve it from this transport """
+        self.app = app
+        app.transport = (self,)
+        app.loop = asyncio.get_event_loop()
+        app._create_logger()
+        try:
+            app._set_cors_handler(CORSHandler.from_config(app.config))
+        except ValueError:
+            # config not loaded
+            pass
+        await app._wrap_handlers()
+        self.listen(loop=app.loop, config=app.config)
+        await app.run_on_start_hooks()
+        await self.start(app.handle_request)
+
+    async def stop_app(self):
+        """ coroutine: Run the on_stop hooks of the app """
+        await self.app.run_on_stop_hooks()
+
+    async def send_concurrent(self, requests: Iterable[webtypes.Request], *,
+                              concurrency: int=None
+                              ) -> Tuple[List[webtypes.Response], List[float]]:
+        """
+        coroutine: Send requests through the app concurrently, at most
+        `concurrency` at a time (all at once by default).
+        Returns the responses and the latency of each in seconds,
+        in the order of the requests.
+        """
+        requests = list(requests)
+        semaphore = asyncio.Semaphore(concurrency or len(requests) or 1)
+
+        async def send(request):
+            async with semaphore:
+                start = time.perf_counter()
+                response = await self.send_async_request(request)
+                return response, time.perf_counter() - start
+
+        results = await asyncio.gather(*(send(r) for r in requests))
+        return [r for r, _ in results], [latency for _, latency in results]
+
+    async def send_http(self, data: bytes, *, chunk_size: int=None,
+                        timeout: float=5) -> bytes:
+        """
+        coroutine: Feed raw bytes to the HTTP transports protocol, as if
+        they came from a socket, and return the bytes it writes back.
+        `chunk_size` splits the data into several reads.
+        """
+        from .httptransport import HTTPTransport, _HTTPServerProtocol
+        if self._http is None:
+            self._http = HTTPTransport()
+            self._http._handler = self.handler
+        loop = asyncio.get_event_loop()
+        protocol = _HTTPServerProtocol(parent=self._http, loop=loop)
+        transport = _MemoryTransport()
+        protocol.connection_made(transport)
+        chunk_size = chunk_size or len(data) or 1
+        for i in range(0, len(data), chunk_size):
+            if transport.is_closing():
+                break
+            protocol.data_received(data[i:i + chunk_size])
+        try:
+            await asyncio.wait_for(transport.closed.wait(), timeout)
+        finally:
+            protocol.connection_lost(None)
+        return bytes(transport.data)
+
     def send_request(self, request):
         loop = asyncio.get_event_loop()
         return loop.run_until_complete(self.send_async_request(request))
@@ -48,7 +148,8 @@ class TestTransport(TransportABC):
             request.body = request.body.encode()
 
         response = await self.handler(request)
-        response.body = response.body
+        # decode once up front, without throwing away the encoded body
+        _ = response.body
         return response
 
     async def start(self, request_handler: callable):
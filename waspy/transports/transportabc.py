@@ -7,6 +7,10 @@ from .. import webtypes
 
 class ClientTransportABC(ABC):
     """Abstract Base Class for implementing client transports"""
+    # True if `make_request` can take dict and list bodies as they are,
+    # instead of bytes encoded by the client
+    accepts_objects = False
+
     @abstractmethod
     async def make_request(self, service: str, method: str, path: str,
                            body: bytes=None, query: str=None,
@@ -66,5 +70,20 @@ class TransportABC(ABC):
 class WorkerTransportABC(ABC):
     """ Abstract Base Class for implementing worker transports """
     @abstractmethod
-    def start(self):
-        pass
+    def listen(self, *, loop, config):
+        """ Establish the connection to the task source.
+        Same as TransportABC.listen
+        """
+
+    @abstractmethod
+    async def start(self, task_handler: callable):
+        """ Start consuming tasks. `task_handler` is a coroutine function
+        that takes a `waspy.worker.Task`. A task is acknowledged when the
+        handler returns, and retried, rejected or requeued when it raises
+        one of the `waspy.exceptions.TaskError` exceptions.
+        This shouldn't return until shutdown.
+        """
+
+    @abstractmethod
+    def shutdown(self):
+        """ Signals that we are shutting down """
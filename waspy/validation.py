@@ -0,0 +1,211 @@
+"""
+Declarative request validation.
+
+Schemas are a small subset of JSON schema (`type`, `properties`,
+`required`, `additionalProperties`, `items`, `enum`, `minimum`, `maximum`,
+`minLength`, `maxLength`, `minItems`, `maxItems` and `pattern`). They are
+compiled once, when a route is added, into nested validator functions so
+requests only pay for the checks their schema actually has.
+
+Query and path parameters are always strings, so for them `integer`,
+`number` and `boolean` check that the value can be read as one, and the
+bounds are checked against the converted value.
+"""
+import re
+from typing import Callable, List, Optional
+
+_TYPES = {
+    'object': dict,
+    'array': list,
+    'string': str,
+    'integer': int,
+    'number': (int, float),
+    'boolean': bool,
+    'null': type(None),
+}
+
+_BOOLEAN_STRINGS = {'true': True, 'false': False, '1': True, '0': False}
+
+
+class SchemaError(ValueError):
+    """ Raised when a schema itself is not valid """
+
+
+def _string_converter(type_name):
+    """ How a string parameter is read as `type_name`,
+        for query and path parameters """
+    if type_name == 'integer':
+        return int
+    if type_name == 'number':
+        return float
+    if type_name == 'boolean':
+        return lambda value: _BOOLEAN_STRINGS[value.lower()]
+    return None
+
+
+def _type_check(type_name, from_strings):
+    """ Returns a function that returns the (converted) value, or raises
+        ValueError when the value is not of the type """
+    if type_name not in _TYPES:
+        raise SchemaError(f'Unknown type "{type_name}"')
+    if from_strings:
+        converter = _string_converter(type_name)
+        if converter is not None:
+            def check(value):
+                try:
+                    return converter(value)
+                except (ValueError, KeyError):
+                    raise ValueError(f'must be {type_name}')
+            return check
+    expected = _TYPES[type_name]
+    exclude_bool = type_name in ('integer', 'number')
+
+    def check(value):
+        if not isinstance(value, expected) or \
+                (exclude_bool and isinstance(value, bool)):
+            raise ValueError(f'must be {type_name}')
+        return value
+    return check
+
+
+def _compile(schema: dict, from_strings: bool=False) -> Callable:
+    """ Compile a schema node into `validate(value, location, errors)` """
+    if not isinstance(schema, dict):
+        raise SchemaError(f'Schema must be a dict, not {schema!r}')
+    checks = []
+
+    type_name = schema.get('type')
+    convert = _type_check(type_name, from_strings) if type_name else None
+
+    if 'enum' in schema:
+        options = list(schema['enum'])
+
+        def check_enum(value):
+            if value not in options:
+                return f'must be one of {options}'
+        checks.append(check_enum)
+
+    for key, compare, message in (
+            ('minimum', lambda v, b: v < b, 'must be at least {}'),
+            ('maximum', lambda v, b: v > b, 'must be at most {}'),
+            ('minLength', lambda v, b: len(v) < b, 'must be at least {} long'),
+            ('maxLength', lambda v, b: len(v) > b, 'must be at most {} long'),
+            ('minItems', lambda v, b: len(v) < b, 'must have at least {} items'),
+            ('maxItems', lambda v, b: len(v) > b, 'must have at most {} items')):
+        if key in schema:
+            checks.append(_bound_check(compare, schema[key],
+                                       message.format(schema[key])))
+
+    if 'pattern' in schema:
+        pattern = re.compile(schema['pattern'])
+
+        def check_pattern(value):
+            if not pattern.search(value):
+                return f'must match {pattern.pattern}'
+        checks.append(check_pattern)
+
+    children = None
+    if 'properties' in schema or 'required' in schema or \
+            schema.get('additionalProperties') is False:
+        children = _compile_properties(schema, from_strings)
+    elif 'items' in schema:
+        item_validator = _compile(schema['items'], from_strings)
+
+        def children(value, location, errors):
+            for index, item in enumerate(value):
+                item_validator(item, f'{location}[{index}]', errors)
+
+    def validate(value, location, errors):
+        if convert is not None:
+            try:
+                value = convert(value)
+            except ValueError as e:
+                errors.append({'location': location, 'message': str(e)})
+                return
+        for check in checks:
+            try:
+                message = check(value)
+            except TypeError:
+                # a check that doesnt apply to this type of value
+                continue
+            if message:
+                errors.append({'location': location, 'message': message})
+        if children is not None and isinstance(value, (dict, list)):
+            children(value, location, errors)
+    return validate
+
+
+def _bound_check(compare, bound, message):
+    def check(value):
+        if compare(value, bound):
+            return message
+    return check
+
+
+def _compile_properties(schema, from_strings):
+    properties = {name: _compile(sub_schema, from_strings)
+                  for name, sub_schema in schema.get('properties', {}).items()}
+    required = tuple(schema.get('required', ()))
+    closed = schema.get('additionalProperties', True) is False
+
+    def validate_properties(value, location, errors):
+        if not isinstance(value, dict):
+            return
+        for name in required:
+            if name not in value:
+                errors.append({'location': f'{location}.{name}',
+                               'message': 'is required'})
+        for name, property_value in value.items():
+            validator = properties.get(name)
+            if validator is not None:
+                validator(property_value, f'{location}.{name}', errors)
+            elif closed:
+                errors.append({'location': f'{location}.{name}',
+                               'message': 'is not allowed'})
+    return validate_properties
+
+
+def _compile_parameters(schema, location):
+    """ Query and path parameters are validated one by one, since there is
+        no dictionary to hand around """
+    if schema is None:
+        return None
+    properties = tuple(
+        (name, f'{location}.{name}', _compile(sub_schema, from_strings=True))
+        for name, sub_schema in schema.get('properties', {}).items())
+    required = frozenset(schema.get('required', ()))
+
+    def validate_parameters(params, errors):
+        for name, name_location, validator in properties:
+            value = params.get(name)
+            if value is None:
+                if name in required:
+                    errors.append({'location': name_location,
+                                   'message': 'is required'})
+                continue
+            validator(value, name_location, errors)
+    return validate_parameters
+
+
+class RequestValidator:
+    """ Validates the body, query and path parameters of a request against
+        schemas compiled when the validator is created """
+    __slots__ = ('_body', '_query', '_path')
+
+    def __init__(self, *, body: dict=None, query: dict=None,
+                 path: dict=None):
+        self._body = _compile(body) if body is not None else None
+        self._query = _compile_parameters(query, 'query')
+        self._path = _compile_parameters(path, 'path')
+
+    def __call__(self, request) -> Optional[List[dict]]:
+        """ Returns a list of errors, or None if the request is valid """
+        errors = []
+        if self._path is not None:
+            self._path(request.path_params, errors)
+        if self._query is not None:
+            self._query(request.query, errors)
+        if self._body is not None:
+            # request.body is decoded once and cached for the handler
+            self._body(request.body, 'body', errors)
+        return errors or None
@@ -1,17 +1,17 @@
-from collections import defaultdict
 from urllib import parse
-from http import HTTPStatus, cookies
+from http import HTTPStatus
 import uuid
 
-from aenum import extend_enum
-
 from waspy import exceptions
 from waspy.parser import parsers
 from .router import Methods
+from .cookies import RequestCookies, build_set_cookie
+
 
-extend_enum(HTTPStatus, 'INVALID_REQUEST', (430, 'Invalid Request',
-                                            'Request was syntactically sound, '
-                                            'but failed validation rules'))
+def _unquote(value: str) -> str:
+    if '%' in value or '+' in value:
+        return parse.unquote_plus(value)
+    return value
 
 
 class QueryParams:
@@ -20,39 +20,91 @@ class QueryParams:
 
     this has all the normal dictionary methods, and works as normal but does
     not override a key when `add` is used, and also has `getall`
+
+    Query strings are split in a single pass the first time they are used,
+    and values are only url decoded when their key is looked up.
     """
-    __slots__ = ['mappings']
+    __slots__ = ['_string', '_raw', '_decoded']
 
     @classmethod
     def from_string(cls, string):
         query_params = QueryParams()
-        qs = parse.parse_qsl(string)
-        for k, v in qs:
-            query_params.add(k, v)
-
+        query_params._string = string or ''
         return query_params
 
     def __init__(self):
-        self.mappings = defaultdict(list)
+        self._string = None
+        self._raw = None
+        self._decoded = {}
+
+    def _parsed(self) -> dict:
+        """ key -> list of still encoded values """
+        if self._raw is None:
+            raw = {}
+            if self._string:
+                for pair in self._string.split('&'):
+                    key, _, value = pair.partition('=')
+                    if not value:
+                        # like parse_qsl, blank values are left out
+                        continue
+                    key = _unquote(key)
+                    values = raw.get(key)
+                    if values is None:
+                        raw[key] = [value]
+                    else:
+                        values.append(value)
+            self._raw = raw
+        return self._raw
+
+    @property
+    def mappings(self) -> dict:
+        return {name: self.getall(name) for name in self._parsed()}
 
     def get(self, name, default=None):
-        return self.mappings.get(name, [default])[0]
+        values = self.getall(name)
+        if not values:
+            return default
+        return values[0]
 
     def getall(self, name, default=None):
-        return self.mappings.get(name, default)
+        values = self._decoded.get(name)
+        if values is None:
+            raw = self._parsed().get(name)
+            if raw is None:
+                return default
+            values = self._decoded[name] = [_unquote(v) for v in raw]
+        return values
 
     def __getitem__(self, key):
-        try:
-            return self.mappings.__getitem__(key)[0]
-        except IndexError:
-            raise KeyError('Invalid Key: {key}'.format(key))
+        values = self.getall(key)
+        if not values:
+            raise KeyError('Invalid Key: {key}'.format(key=key))
+        return values[0]
 
     def __setitem__(self, key, value):
         raise TypeError('MultiDict does not support item assignment. '
                         'Use .add(k, v) instead.')
 
+    def __contains__(self, key):
+        return key in self._parsed()
+
+    def __iter__(self):
+        return iter(self._parsed())
+
+    def __len__(self):
+        return len(self._parsed())
+
+    def keys(self):
+        return self._parsed().keys()
+
+    def items(self):
+        return ((name, self[name]) for name in self._parsed())
+
     def add(self, name, value):
-        self.mappings[name].append(value)
+        values = self.getall(name)
+        if values is None:
+            values = self._decoded[name] = self._raw[name] = []
+        values.append(value)
 
     def __str__(self):
         return parse.urlencode(self.mappings, doseq=True)
@@ -109,10 +161,11 @@ class Parseable:
             # Transports sometimes set the value after the response is created
             # Setting it to the original_body allows for lazy parsing
             self.original_body = value
-            # Reset body and raw_body
-            self._raw_body = None
+            # The bytes are already encoded, so they are kept as the raw body
+            # and are only decoded if someone asks for the body
+            self._raw_body = value
             self._body = None
-        elif isinstance(value, dict):
+        else:
             self._body = value
             # Reset the raw_body
             self.original_body = value
@@ -120,7 +173,8 @@ class Parseable:
 
     @property
     def raw_body(self) -> bytes:
-        """ Encoded Body """
+        """ Encoded Body. Encoded once, and cached until the body is set
+            again, so transports and logging can all reuse it. """
         if self._raw_body is None and self.original_body is not None:
             if isinstance(self.original_body, dict):
                 self._raw_body = self.parser.encode(self.original_body)
@@ -167,6 +221,8 @@ class Request(Parseable):
         self.app = None
         self.content_type = content_type
         self._cookies = None
+        # set by in process transports, which hand bodies over as objects
+        self.in_process = False
 
     @property
     def method(self):
@@ -185,19 +241,15 @@ class Request(Parseable):
         return self.path + query
 
     @property
-    def cookies(self) -> dict:
+    def cookies(self) -> RequestCookies:
         if self._cookies is None:
-            self._cookies = {}
-            raw = self.headers.get('cookie', None)
-            if raw:
-                cookie_manager = cookies.SimpleCookie(raw)
-                self._cookies = {i: cookie_manager[i].value for i in cookie_manager}
+            self._cookies = RequestCookies(self.headers.get('cookie'))
         return self._cookies
 
     @property
     def query(self) -> QueryParams:
         # parse query string into a dictionary
-        if not self._query_params:
+        if self._query_params is None:
             self._query_params = QueryParams.from_string(self.query_string)
         return self._query_params
 
@@ -234,7 +286,7 @@ class Response(Parseable):
         if not headers:
             headers = dict()
         if isinstance(status, int):  # convert to enum
-            status = HTTPStatus(status)
+            status = exceptions.http_status(status)
         if meta is None:
             meta = {}
         self.headers = headers
@@ -245,7 +297,48 @@ class Response(Parseable):
         self.app = None
         self._body = None
         self._raw_body = None
+        self.cookies = []
+
+    def set_cookie(self, name: str, value: str, **attributes):
+        """
+        Add a Set-Cookie header. Can be called once per cookie.
+        Takes the keyword arguments of `waspy.cookies.build_set_cookie`
+        (max_age, expires, path, domain, secure, httponly, samesite)
+        """
+        self.cookies.append(build_set_cookie(name, value, **attributes))
+
+    def delete_cookie(self, name: str, *, path: str='/', domain: str=None):
+        self.set_cookie(name, '', max_age=0, expires=0,
+                        path=path, domain=domain)
 
     def __str__(self):
         return('<Response({status})@{id}>'
                .format(status=self.status, id=id(self)))
+
+
+class Task(Parseable):
+    def __init__(self, body: bytes=None, headers: dict=None,
+                 correlation_id: str=None, content_type=None,
+                 name: str=None, message_id: str=None, attempt: int=1):
+        """
+        A unit of work handed to a `waspy.worker.Worker`
+        :param body: message body
+        :param headers:
+        :param correlation_id:
+        :param content_type:
+        :param name: what the task was published as (e.g. the routing key)
+        :param message_id:
+        :param attempt: 1 for the first delivery, incremented on every retry
+        """
+        super().__init__(body=body, content_type=content_type)
+        if headers is None:
+            headers = {}
+        self.headers = headers
+        self.correlation_id = correlation_id or str(uuid.uuid4())
+        self.name = name
+        self.message_id = message_id
+        self.attempt = attempt
+
+    def __str__(self):
+        return ('<Task({name} #{attempt})@{id}>'
+                .format(name=self.name, attempt=self.attempt, id=id(self)))
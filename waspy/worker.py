@@ -1,18 +1,161 @@
-from typing import Union, List, Iterable
+import asyncio
+import logging
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from typing import Union, Iterable, Callable
+
+from .parser import ParserABC, JSONParser, parsers as app_parsers
+from .webtypes import Task
 from .transports.transportabc import WorkerTransportABC
-from .transports.rabbitmqtransport import RabbitMQWorkerTransport
+from .configuration import Config
+from .ctx import request_context, call_with_context
+
+logger = logging.getLogger('waspy')
+
 
+def _process_pool(max_workers=None):
+    # importing ProcessPoolExecutor pulls in multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    return ProcessPoolExecutor(max_workers=max_workers)
 
-class Task:
-    pass
+
+EXECUTORS = {
+    'thread': ThreadPoolExecutor,
+    'process': _process_pool,
+}
 
 
 class Worker:
     def __init__(self,
                  transport: Union[WorkerTransportABC,
-                                  Iterable[WorkerTransportABC]]):
+                                  Iterable[WorkerTransportABC]],
+                 handler: Callable=None,
+                 *,
+                 executor: str=None,
+                 max_workers: int=None,
+                 config: Config=None,
+                 loop=None,
+                 parsers=None,
+                 default_content_type='application/json'):
+        """
+        Runs tasks from a worker transport.
+
+        :param transport: one or more worker transports to consume from
+        :param handler: called with every `Task`. A coroutine function, or
+            a regular function when an `executor` is used.
+        :param executor: `'thread'` or `'process'` to run the handler in a
+            pool instead of on the event loop. Process pool handlers must be
+            picklable (module level) functions, and get the task with its
+            body already decoded.
+        :param max_workers: size of the executor pool
+        """
+        if isinstance(transport, (list, set)):
+            transport = tuple(transport)
+        if not isinstance(transport, tuple):
+            transport = (transport,)
+        if executor is not None and executor not in EXECUTORS:
+            raise ValueError(f'Unknown executor "{executor}". '
+                             f'Use one of {sorted(EXECUTORS)}')
+        if not config:
+            config = Config()
+
+        if not parsers:
+            parsers = [JSONParser()]
+        for parser in parsers:
+            self.add_parser(parser)
+
         self.transport = transport
+        self.handler = handler
+        self.executor = executor
+        self.max_workers = max_workers
+        self.config = config
+        self.loop = loop
+        self.default_content_type = default_content_type
+        self.on_start = []
+        self.on_stop = []
+        self._pool = None
+
+    def add_parser(self, parser: ParserABC):
+        app_parsers[parser.content_type] = parser
+
+    def task(self, handler: Callable):
+        """ Decorator to set the task handler """
+        self.handler = handler
+        return handler
+
+    def start_shutdown(self, signum=None, frame=None):
+        for t in self.transport:
+            t.shutdown()
 
     def run(self):
-        if self.transport is None:
-            pass
+        if self.handler is None:
+            raise ValueError('Worker has no task handler')
+        if not self.loop:
+            self.loop = asyncio.get_event_loop()
+        loop = self.loop
+
+        if self.config['debug']:
+            logger.setLevel('DEBUG')
+            self.loop.set_debug(True)
+
+        if self.executor is not None:
+            self._pool = EXECUTORS[self.executor](max_workers=self.max_workers)
+
+        for t in self.transport:
+            t.listen(loop=loop, config=self.config)
+
+        loop.run_until_complete(self._run_hooks(self.on_start))
+
+        tasks = [t.start(self.handle_task) for t in self.transport]
+
+        loop.add_signal_handler(signal.SIGTERM, self.start_shutdown)
+        loop.add_signal_handler(signal.SIGINT, self.start_shutdown)
+
+        # Run all transports - they shouldn't return until shutdown
+        loop.run_until_complete(asyncio.gather(*tasks))
+
+        self.shutdown()
+
+    async def handle_task(self, task: Task):
+        """
+        coroutine: This method is called by the worker transport
+        for every task. Exceptions are left for the transport, which
+        decides how to settle the task.
+        """
+        task.app = self
+        request_context.set({
+            'correlation_id': task.correlation_id,
+            'ctx_headers': {k: v for k, v in task.headers.items()
+                            if k.startswith('ctx-')}})
+        if self._pool is None:
+            return await self.handler(task)
+
+        # decode on the loop, so the pool only deals in plain data
+        task.content_type = task.content_type or self.default_content_type
+        _ = task.body
+        task.app = None
+        loop = asyncio.get_event_loop()
+        if self.executor == 'thread':
+            return await loop.run_in_executor(
+                self._pool, copy_context().run, self.handler, task)
+        return await loop.run_in_executor(
+            self._pool, call_with_context, request_context.get(),
+            self.handler, task)
+
+    async def _run_hooks(self, hooks):
+        coros = []
+        while len(hooks):
+            hook = hooks.pop()
+            if asyncio.iscoroutinefunction(hook):
+                coros.append(hook(self))
+            else:
+                hook(self)
+        await asyncio.gather(*coros)
+
+    def shutdown(self):
+        self.loop.run_until_complete(self._run_hooks(self.on_stop))
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+        self.loop.close()